@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+
+def user_key(user_pk):
+    return f"accounts:user:{user_pk}"
+
+
+def forget_user(user_pk):
+    cache.delete(user_key(user_pk))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend that keeps the user of each session in the cache, so that request.user costs
+    no query. The entry is dropped when the user is saved or deleted, which covers password
+    changes, and on logout. Counters changed with QuerySet.update(), such as followers_count,
+    can be USER_CACHE_TIMEOUT seconds old on request.user.
+
+    The password hash is not cached, only the session hash derived from it, which every
+    session already stores. The password of a cached user is a deferred field, loaded from
+    the database when it is read, e.g. to check or change it.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        field_names = [field.attname for field in UserModel._meta.concrete_fields if field.attname != "password"]
+        cached = cache.get(user_key(user_id))
+        if cached is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                values = [getattr(user, field_name) for field_name in field_names]
+                cache.set(user_key(user_id), (values, user.get_session_auth_hash()), settings.USER_CACHE_TIMEOUT)
+            return user
+        values, session_auth_hash = cached
+        user = UserModel.from_db(DEFAULT_DB_ALIAS, field_names, values)
+        user._session_auth_hash = session_auth_hash
+        return user
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.checks import Error, Tags, register
+
+# Cache backends whose entries are only seen by the process that wrote them.
+PROCESS_LOCAL_CACHE_BACKENDS = [
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+]
+
+CACHED_SESSION_ENGINES = [
+    "django.contrib.sessions.backends.cache",
+    "django.contrib.sessions.backends.cached_db",
+]
+
+
+def process_local_cache():
+    """Whether the default cache is private to each process, so that other processes miss its invalidations."""
+    return settings.CACHES[DEFAULT_CACHE_ALIAS]["BACKEND"] in PROCESS_LOCAL_CACHE_BACKENDS
+
+
+@register(Tags.caches, Tags.security)
+def check_session_cache(app_configs, **kwargs):
+    if not process_local_cache():
+        return []
+    errors = []
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES:
+        errors.append(
+            Error(
+                f"SESSION_ENGINE {settings.SESSION_ENGINE!r} needs a cache shared by every process.",
+                hint="Set DJANGO_REDIS_URL, or use django.contrib.sessions.backends.db.",
+                id="accounts.E001",
+            )
+        )
+    if "accounts.backends.CachedModelBackend" in settings.AUTHENTICATION_BACKENDS:
+        errors.append(
+            Error(
+                "CachedModelBackend needs a cache shared by every process, or a changed password "
+                "leaves the sessions cached by other processes logged in.",
+                hint="Set DJANGO_REDIS_URL, or use django.contrib.auth.backends.ModelBackend.",
+                id="accounts.E002",
+            )
+        )
+    return errors
@@ -0,0 +1,93 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from tweets.models import Like, Tweet
+
+from .models import FriendShip
+
+# Records are in the format read by import_jsonl, so that an export can be imported elsewhere.
+CSV_FIELDS = [
+    "type",
+    "username",
+    "email",
+    "date_joined",
+    "id",
+    "content",
+    "follower",
+    "following",
+    "tweet_id",
+    "created_at",
+]
+FORMATS = {"jsonl": "application/x-ndjson", "csv": "text/csv"}
+
+
+def records(user, chunk_size=None):
+    """
+    Yields the user, their tweets, follows in both directions and likes as dicts. Rows are read
+    with iterator() as plain tuples, so memory does not grow with the size of the account.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    yield {
+        "type": "user",
+        "username": user.username,
+        "email": user.email,
+        "date_joined": user.date_joined.isoformat(),
+    }
+
+    tweets = Tweet.objects.filter(user=user).order_by("created_at", "id").values_list("id", "content", "created_at")
+    for pk, content, created_at in tweets.iterator(chunk_size=chunk_size):
+        yield {
+            "type": "tweet",
+            "id": pk,
+            "username": user.username,
+            "content": content,
+            "created_at": created_at.isoformat(),
+        }
+
+    follows = FriendShip.objects.order_by("created_at", "id").values_list(
+        "follower__username", "following__username", "created_at"
+    )
+    for friendships in [follows.filter(follower=user), follows.filter(following=user)]:
+        for follower, following, created_at in friendships.iterator(chunk_size=chunk_size):
+            yield {
+                "type": "follow",
+                "follower": follower,
+                "following": following,
+                "created_at": created_at.isoformat(),
+            }
+
+    likes = Like.objects.filter(user=user).order_by("id").values_list("tweet_id", "created_at")
+    for tweet_pk, created_at in likes.iterator(chunk_size=chunk_size):
+        yield {"type": "like", "username": user.username, "tweet_id": tweet_pk, "created_at": created_at.isoformat()}
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def render(user, output_format, chunk_size=None):
+    """Yields the user's records as lines of ``output_format``, one of FORMATS."""
+    if output_format == "jsonl":
+        for record in records(user, chunk_size):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+    else:
+        writer = csv.DictWriter(Echo(), CSV_FIELDS)
+        yield writer.writeheader()
+        for record in records(user, chunk_size):
+            yield writer.writerow(record)
+
+
+async def arender(user, output_format, chunk_size=None):
+    """
+    render() for ASGI, where the ORM cannot run on the event loop. Lines are read in the
+    thread of sync views, ``chunk_size`` at a time, and yielded joined.
+    """
+    lines = render(user, output_format, chunk_size)
+    read = sync_to_async(lambda: list(islice(lines, chunk_size or settings.EXPORT_CHUNK_SIZE)))
+    while chunk := await read():
+        yield "".join(chunk)
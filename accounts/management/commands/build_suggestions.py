@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from accounts import suggestions
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the friend-of-friend follow suggestions of the users affected by follows and unfollows "
+        "since the last run, or of every user with --full. Follows created with bulk_create(), such as "
+        "those of import_jsonl, are not logged and only reach the suggestions with --full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute every user from the whole graph.")
+        parser.add_argument("--batch-size", type=int, help="FriendShip rows or users per query.")
+
+    def handle(self, *args, **options):
+        if options["full"]:
+            count = suggestions.rebuild(options["batch_size"])
+        else:
+            count = suggestions.update(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Updated the suggestions of {count} user(s)."))
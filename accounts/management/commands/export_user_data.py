@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Stream a user's tweets, follows and likes as JSONL or CSV, in the format read by import_jsonl."
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("--format", choices=export.FORMATS, default="jsonl")
+        parser.add_argument("--chunk-size", type=int, help="Rows fetched per query.")
+        parser.add_argument("--output", help="Write the export to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']} does not exist.")
+
+        lines = export.render(user, options["format"], options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
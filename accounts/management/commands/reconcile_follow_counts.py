@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from accounts.models import FriendShip
+
+User = get_user_model()
+
+
+def _friendship_count(field):
+    return Coalesce(
+        Subquery(
+            FriendShip.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = "Fix CustomUser follower/following counters that drifted from the FriendShip rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        followers_count = _friendship_count("following")
+        followings_count = _friendship_count("follower")
+
+        last_pk = 0
+        fixed = 0
+        while True:
+            users = (
+                User.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .annotate(actual_followers=followers_count, actual_followings=followings_count)
+                .values_list("pk", "followers_count", "followings_count", "actual_followers", "actual_followings")
+            )
+            batch = list(users[: options["batch_size"]])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            drifted = [row[0] for row in batch if row[1:3] != row[3:5]]
+            if drifted:
+                fixed += User.objects.filter(pk__in=drifted).update(
+                    followers_count=followers_count, followings_count=followings_count
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {fixed} user(s)."))
@@ -0,0 +1,40 @@
+# Generated by Django 4.1.13 on 2026-10-18 00:49
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_friendship_counts(apps, schema_editor):
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    FriendShip = apps.get_model("accounts", "FriendShip")
+
+    def friendship_count(field):
+        friendships = FriendShip.objects.filter(**{field: OuterRef("pk")}).order_by().values(field)
+        return Coalesce(Subquery(friendships.annotate(count=Count("pk")).values("count")), 0)
+
+    CustomUser.objects.update(
+        followers_count=friendship_count("following"),
+        followings_count=friendship_count("follower"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_friendship_friendship_follow_unique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="followers_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="followings_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_friendship_counts, migrations.RunPython.noop),
+    ]
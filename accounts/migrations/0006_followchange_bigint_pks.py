@@ -0,0 +1,23 @@
+# Generated by Django 4.1.13 on 2026-10-18 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0005_suggestions"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="followchange",
+            name="follower_pk",
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name="followchange",
+            name="following_pk",
+            field=models.BigIntegerField(),
+        ),
+    ]
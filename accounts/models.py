@@ -4,14 +4,52 @@ from django.db import models
 
 class CustomUser(AbstractUser):
     email = models.EmailField(max_length=254)
+    followers_count = models.IntegerField(default=0)
+    followings_count = models.IntegerField(default=0)
+
+    def get_session_auth_hash(self):
+        # Users read from the cache by CachedModelBackend come with the hash instead of the password.
+        if "password" in self.get_deferred_fields() and hasattr(self, "_session_auth_hash"):
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
 
 
 class FriendShip(models.Model):
-    following = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="followings")
-    follower = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="followers")
+    following = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="followings", db_index=False)
+    follower = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="followers", db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=["following", "follower"], name="follow_unique"),
         ]
+        indexes = [
+            models.Index(fields=["follower", "created_at"], name="friendship_follower_idx"),
+            models.Index(fields=["following", "created_at"], name="friendship_following_idx"),
+        ]
+
+
+class FollowChange(models.Model):
+    """
+    Log of follows and unfollows, consumed by build_suggestions. Plain integers, so that the
+    entries written while a user is deleted outlive the user.
+    """
+
+    follower_pk = models.BigIntegerField()
+    following_pk = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class Suggestion(models.Model):
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="suggestions", db_index=False)
+    candidate = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="+")
+    score = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "candidate"], name="suggestion_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-score", "candidate"], name="suggestion_rank_idx"),
+        ]
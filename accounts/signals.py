@@ -0,0 +1,42 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .backends import forget_user
+from .models import FollowChange, FriendShip
+
+User = get_user_model()
+
+
+@receiver(pre_delete, sender=User)
+def release_friendships(sender, instance, **kwargs):
+    User.objects.filter(followings__follower=instance).update(followers_count=F("followers_count") - 1)
+    User.objects.filter(followers__following=instance).update(followings_count=F("followings_count") - 1)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    # Again after commit, in case a request cached the old row in between.
+    forget_user(instance.pk)
+    transaction.on_commit(lambda: forget_user(instance.pk))
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
+
+
+@receiver(post_save, sender=FriendShip)
+def log_follow(sender, instance, created, **kwargs):
+    if created:
+        FollowChange.objects.create(follower_pk=instance.follower_id, following_pk=instance.following_id)
+
+
+@receiver(post_delete, sender=FriendShip)
+def log_unfollow(sender, instance, **kwargs):
+    FollowChange.objects.create(follower_pk=instance.follower_id, following_pk=instance.following_id)
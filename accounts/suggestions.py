@@ -0,0 +1,121 @@
+import heapq
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import FollowChange, FriendShip, Suggestion
+
+# Friend-of-friend suggestions: a candidate's score is how many of the user's followings
+# follow them. build_suggestions precomputes the top SUGGESTION_LIMIT candidates of every
+# user into Suggestion, so that showing them costs one indexed query per request.
+
+
+def load_followings(user_pks=None, batch_size=None):
+    """
+    Returns {follower_pk: array of following pks} for ``user_pks``, or for every user when it
+    is None, reading FriendShip in batches of ``batch_size`` rows or users.
+    """
+    batch_size = batch_size or settings.SUGGESTION_BATCH_SIZE
+    followings = defaultdict(lambda: array("l"))
+    if user_pks is None:
+        last_pk = 0
+        while True:
+            batch = list(
+                FriendShip.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", "follower_id", "following_id")[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            for _, follower_pk, following_pk in batch:
+                followings[follower_pk].append(following_pk)
+    else:
+        user_pks = sorted(user_pks)
+        for start in range(0, len(user_pks), batch_size):
+            rows = FriendShip.objects.filter(follower_id__in=user_pks[start : start + batch_size]).values_list(
+                "follower_id", "following_id"
+            )
+            for follower_pk, following_pk in rows:
+                followings[follower_pk].append(following_pk)
+    return followings
+
+
+def rank(user_pk, followings, limit=None):
+    """Returns the user's top (candidate_pk, score) pairs, highest score and then lowest pk first."""
+    followed = set(followings.get(user_pk, ()))
+    scores = Counter()
+    for following_pk in followed:
+        scores.update(followings.get(following_pk, ()))
+    for pk in followed | {user_pk}:
+        scores.pop(pk, None)
+    return heapq.nsmallest(limit or settings.SUGGESTION_LIMIT, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def store(user_pks, followings):
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id__in=user_pks).delete()
+        Suggestion.objects.bulk_create(
+            [
+                Suggestion(user_id=user_pk, candidate_id=candidate_pk, score=score)
+                for user_pk in user_pks
+                for candidate_pk, score in rank(user_pk, followings)
+            ]
+        )
+
+
+def rebuild(batch_size=None):
+    """Recomputes the suggestions of every user from the whole graph and returns how many were updated."""
+    batch_size = batch_size or settings.SUGGESTION_BATCH_SIZE
+    # Changes logged after this point are left for the next update.
+    last_change = FollowChange.objects.aggregate(pk=Max("pk"))["pk"] or 0
+    followings = load_followings(batch_size=batch_size)
+    user_pks = sorted(followings)
+    for start in range(0, len(user_pks), batch_size):
+        store(user_pks[start : start + batch_size], followings)
+    # Users who follow nobody any more.
+    Suggestion.objects.exclude(user_id__in=FriendShip.objects.values("follower_id")).delete()
+    FollowChange.objects.filter(pk__lte=last_change).delete()
+    return len(user_pks)
+
+
+def update(batch_size=None):
+    """
+    Recomputes the suggestions of the users affected by the logged changes and returns how many
+    were updated. A change of A's followings changes the candidates of A and of A's followers,
+    and only their followings and their followings' followings are loaded.
+    """
+    batch_size = batch_size or settings.SUGGESTION_BATCH_SIZE
+    changes = list(FollowChange.objects.order_by("pk").values_list("pk", "follower_pk"))
+    if not changes:
+        return 0
+    changed = sorted({follower_pk for _, follower_pk in changes})
+    affected = set(changed)
+    for start in range(0, len(changed), batch_size):
+        affected.update(
+            FriendShip.objects.filter(following_id__in=changed[start : start + batch_size]).values_list(
+                "follower_id", flat=True
+            )
+        )
+
+    followings = load_followings(affected, batch_size)
+    second_hop = {pk for pks in followings.values() for pk in pks} - followings.keys()
+    followings.update(load_followings(second_hop, batch_size))
+    user_pks = sorted(affected)
+    for start in range(0, len(user_pks), batch_size):
+        store(user_pks[start : start + batch_size], followings)
+    FollowChange.objects.filter(pk__lte=changes[-1][0]).delete()
+    return len(user_pks)
+
+
+def for_user(user, limit=None):
+    """Returns the user's top suggested users, each with a ``score``, for display."""
+    suggestions = Suggestion.objects.filter(user=user).select_related("candidate").order_by("-score", "candidate")
+    candidates = []
+    for suggestion in suggestions[: limit or settings.SUGGESTIONS_SHOWN]:
+        suggestion.candidate.score = suggestion.score
+        candidates.append(suggestion.candidate)
+    return candidates
@@ -1,11 +1,26 @@
+import csv
+import json
+from io import StringIO
+
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.auth import SESSION_KEY, get_user_model
 from django.contrib.messages import get_messages
-from django.test import TestCase
-from django.urls import reverse
-
-from accounts.models import FriendShip
-from tweets.models import Tweet
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from accounts import export
+from accounts.backends import CachedModelBackend, user_key
+from accounts.checks import check_session_cache
+from accounts.models import FollowChange, FriendShip, Suggestion
+from accounts.views import AsyncFollowView, AsyncUnFollowView
+from mysite.handlers import AsyncStreamingHttpResponse
+from mysite.testing import QueryBudgetTestMixin, QueryPlanTestMixin
+from tweets.models import Inbox, Like, Tweet
 
 User = get_user_model()
 
@@ -271,6 +286,8 @@ class TestUserProfileView(TestCase):
         self.post1 = Tweet.objects.create(user=self.user1, content="testpost1")
         self.post2 = Tweet.objects.create(user=self.user2, content="testpost2")
         FriendShip.objects.create(follower=self.user1, following=self.user2)
+        User.objects.filter(pk=self.user1.pk).update(followings_count=1)
+        User.objects.filter(pk=self.user2.pk).update(followers_count=1)
 
     def test_success_get(self):
         response = self.client.get(self.url)
@@ -289,6 +306,42 @@ class TestUserProfileView(TestCase):
             FriendShip.objects.filter(following=self.user1).count(),
         )
 
+    def test_success_get_not_modified(self):
+        url = reverse("accounts:user_profile", kwargs={"username": self.user2.username})
+        # The first response sets the CSRF cookie, whose secret is part of the ETag.
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+        # The session, its user and the profile the ETag is computed from.
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_success_get_modified(self):
+        url = reverse("accounts:user_profile", kwargs={"username": self.user2.username})
+        changes = [
+            lambda: Tweet.objects.create(user=self.user2, content="testpost3"),
+            lambda: self.client.post(reverse("tweets:like", kwargs={"pk": self.post2.pk})),
+            lambda: self.client.post(reverse("accounts:unfollow", kwargs={"username": self.user2.username})),
+            lambda: self.client.post(reverse("accounts:follow", kwargs={"username": self.user2.username})),
+            lambda: Tweet.objects.filter(content="testpost3").delete(),
+        ]
+        etag = self.client.get(url)["ETag"]
+        for change in changes:
+            change()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+    def test_success_get_modified_for_other_user(self):
+        url = reverse("accounts:user_profile", kwargs={"username": self.user2.username})
+        etag = self.client.get(url)["ETag"]
+        self.client.login(username="testuser2", password="testpassword2")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "フォロー解除")
+
 
 class TestUserProfileEditView(TestCase):
     def test_success_get(self):
@@ -328,6 +381,16 @@ class TestFollowView(TestCase):
             target_status_code=200,
         )
         self.assertTrue(FriendShip.objects.filter(follower=self.user1, following=self.user2).exists())
+        self.user1.refresh_from_db()
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user1.followings_count, 1)
+        self.assertEqual(self.user2.followers_count, 1)
+
+    def test_success_post_backfills_timeline(self):
+        post = Tweet.objects.create(user=self.user2, content="testpost")
+        url = reverse("accounts:follow", kwargs={"username": self.user2.username})
+        self.client.post(url)
+        self.assertTrue(Inbox.objects.filter(owner=self.user1, tweet=post).exists())
 
     def test_failure_post_with_not_exist_user(self):
         url = reverse("accounts:follow", kwargs={"username": "unknown"})
@@ -359,6 +422,8 @@ class TestUnfollowView(TestCase):
         )
         self.client.login(username="testuser1", password="testpassword1")
         FriendShip.objects.create(follower=self.user1, following=self.user2)
+        User.objects.filter(pk=self.user1.pk).update(followings_count=1)
+        User.objects.filter(pk=self.user2.pk).update(followers_count=1)
 
     def test_success_post(self):
         url = reverse("accounts:unfollow", kwargs={"username": self.user2.username})
@@ -370,6 +435,17 @@ class TestUnfollowView(TestCase):
             target_status_code=200,
         )
         self.assertFalse(FriendShip.objects.exists())
+        self.user1.refresh_from_db()
+        self.user2.refresh_from_db()
+        self.assertEqual(self.user1.followings_count, 0)
+        self.assertEqual(self.user2.followers_count, 0)
+
+    def test_success_post_prunes_timeline(self):
+        post = Tweet.objects.create(user=self.user2, content="testpost")
+        Inbox.objects.create(owner=self.user1, tweet=post, created_at=post.created_at)
+        url = reverse("accounts:unfollow", kwargs={"username": self.user2.username})
+        self.client.post(url)
+        self.assertFalse(Inbox.objects.filter(owner=self.user1).exists())
 
     def test_failure_post_with_not_exist_tweet(self):
         url = reverse("accounts:follow", kwargs={"username": "unknown"})
@@ -387,6 +463,60 @@ class TestUnfollowView(TestCase):
         self.assertTrue(FriendShip.objects.filter(follower=self.user1, following=self.user2).exists())
 
 
+@override_settings(ASYNC_VIEWS=True)
+class TestAsyncFollowView(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.async_client.force_login(self.user1)
+
+    def test_success_resolve(self):
+        self.assertIs(resolve(reverse("accounts:follow", args=["testuser2"])).func.view_class, AsyncFollowView)
+        self.assertIs(resolve(reverse("accounts:unfollow", args=["testuser2"])).func.view_class, AsyncUnFollowView)
+
+    async def test_success_post(self):
+        post = await Tweet.objects.acreate(user=self.user2, content="testpost")
+        response = await self.async_client.post(reverse("accounts:follow", kwargs={"username": "testuser2"}))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse("tweets:home"))
+        self.assertTrue(await FriendShip.objects.filter(follower=self.user1, following=self.user2).aexists())
+        self.assertTrue(await Inbox.objects.filter(owner=self.user1, tweet=post).aexists())
+        self.assertEqual((await User.objects.aget(pk=self.user1.pk)).followings_count, 1)
+        self.assertEqual((await User.objects.aget(pk=self.user2.pk)).followers_count, 1)
+
+        response = await self.async_client.post(reverse("accounts:unfollow", kwargs={"username": "testuser2"}))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(await FriendShip.objects.aexists())
+        self.assertFalse(await Inbox.objects.filter(owner=self.user1, tweet=post).aexists())
+        self.assertEqual((await User.objects.aget(pk=self.user2.pk)).followers_count, 0)
+
+    async def test_failure_post_with_not_exist_user(self):
+        response = await self.async_client.post(reverse("accounts:follow", kwargs={"username": "unknown"}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_failure_post_with_self(self):
+        response = await self.async_client.post(reverse("accounts:follow", kwargs={"username": "testuser1"}))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(str(list(get_messages(response.asgi_request))[0]), "自分自身はフォローできません。")
+
+    async def test_failure_post_with_already_followed(self):
+        await FriendShip.objects.acreate(follower=self.user1, following=self.user2)
+        response = await self.async_client.post(reverse("accounts:follow", kwargs={"username": "testuser2"}))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(await FriendShip.objects.acount(), 1)
+
+    async def test_failure_post_unfollow_with_not_followed(self):
+        response = await self.async_client.post(reverse("accounts:unfollow", kwargs={"username": "testuser2"}))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_failure_post_with_anonymous_user(self):
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.post(reverse("accounts:follow", kwargs={"username": "testuser2"}))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse("accounts:login")))
+        self.assertFalse(await FriendShip.objects.aexists())
+
+
 class TestFollowingListView(TestCase):
     def setUp(self):
         self.user1 = User.objects.create_user(
@@ -408,6 +538,35 @@ class TestFollowingListView(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "accounts/following_list.html")
 
+    @override_settings(FOLLOW_LIST_PAGE_SIZE=1)
+    def test_success_get_with_cursor(self):
+        user3 = User.objects.create_user(username="testuser3", email="test3@test.com", password="testpassword3")
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        FriendShip.objects.create(follower=self.user1, following=user3)
+        response = self.client.get(self.url)
+        self.assertEqual([follow.following for follow in response.context["following_list"]], [user3])
+        response = self.client.get(self.url, {"cursor": response.context["next_cursor"]})
+        self.assertEqual([follow.following for follow in response.context["following_list"]], [self.user2])
+        self.assertIsNone(response.context["next_cursor"])
+
+    def test_success_get_relationship(self):
+        user3 = User.objects.create_user(username="testuser3", email="test3@test.com", password="testpassword3")
+        FriendShip.objects.create(follower=self.user2, following=user3)
+        FriendShip.objects.create(follower=user3, following=self.user1)
+        response = self.client.get(reverse("accounts:following_list", kwargs={"username": self.user2.username}))
+        self.assertEqual(
+            {
+                follow.following: (follow.you_follow, follow.follows_you)
+                for follow in response.context["following_list"]
+            },
+            {self.user1: (False, False), user3: (False, True)},
+        )
+        self.assertContains(response, "フォローされています")
+
+    def test_failure_get_with_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
 
 class TestFollowerListView(TestCase):
     def setUp(self):
@@ -429,3 +588,313 @@ class TestFollowerListView(TestCase):
         response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, "accounts/follower_list.html")
+
+    @override_settings(FOLLOW_LIST_PAGE_SIZE=1)
+    def test_success_get_with_cursor(self):
+        user3 = User.objects.create_user(username="testuser3", email="test3@test.com", password="testpassword3")
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+        FriendShip.objects.create(follower=user3, following=self.user1)
+        response = self.client.get(self.url)
+        self.assertEqual([follow.follower for follow in response.context["follower_list"]], [user3])
+        response = self.client.get(self.url, {"cursor": response.context["next_cursor"]})
+        self.assertEqual([follow.follower for follow in response.context["follower_list"]], [self.user2])
+        self.assertIsNone(response.context["next_cursor"])
+
+    def test_success_get_relationship(self):
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+        response = self.client.get(self.url)
+        self.assertEqual(
+            [(follow.you_follow, follow.follows_you) for follow in response.context["follower_list"]],
+            [(True, True)],
+        )
+        self.assertContains(response, "相互フォロー")
+
+
+class TestFriendShipCounts(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.user3 = User.objects.create_user(username="testuser3", email="test3@test.com", password="testpassword3")
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+        FriendShip.objects.create(follower=self.user3, following=self.user1)
+
+    def test_success_reconcile(self):
+        call_command("reconcile_follow_counts", batch_size=2, stdout=StringIO())
+        self.assertQuerysetEqual(
+            User.objects.order_by("pk").values_list("followers_count", "followings_count"),
+            [(2, 1), (1, 1), (0, 1)],
+        )
+
+    def test_success_delete_user(self):
+        call_command("reconcile_follow_counts", stdout=StringIO())
+        self.user1.delete()
+        self.assertQuerysetEqual(
+            User.objects.order_by("pk").values_list("followers_count", "followings_count"),
+            [(0, 0), (0, 0)],
+        )
+
+
+class TestSuggestions(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f"testuser{i}", email=f"test{i}@test.com", password="testpassword")
+            for i in range(5)
+        ]
+        self.user = self.users[0]
+        self.client.login(username="testuser0", password="testpassword")
+        # testuser0 follows 1 and 2, who both follow 3, and 2 also follows 4.
+        for follower, following in [(0, 1), (0, 2), (1, 3), (2, 3), (2, 4), (1, 0)]:
+            FriendShip.objects.create(follower=self.users[follower], following=self.users[following])
+
+    def suggested(self, user):
+        return list(
+            Suggestion.objects.filter(user=user).order_by("-score", "candidate").values_list("candidate", "score")
+        )
+
+    def test_success_full(self):
+        call_command("build_suggestions", "--full", batch_size=2, stdout=StringIO())
+        self.assertEqual(self.suggested(self.user), [(self.users[3].pk, 2), (self.users[4].pk, 1)])
+        self.assertEqual(self.suggested(self.users[1]), [(self.users[2].pk, 1)])
+        self.assertFalse(FollowChange.objects.exists())
+
+    def test_success_incremental(self):
+        call_command("build_suggestions", "--full", stdout=StringIO())
+        self.users[1].followers.get(following=self.users[3]).delete()
+        FriendShip.objects.create(follower=self.users[4], following=self.users[1])
+        out = StringIO()
+        call_command("build_suggestions", batch_size=2, stdout=out)
+        # The two followers who changed, and their followers testuser0 and testuser2.
+        self.assertIn("Updated the suggestions of 4 user(s).", out.getvalue())
+        self.assertEqual(self.suggested(self.user), [(self.users[3].pk, 1), (self.users[4].pk, 1)])
+        self.assertEqual(self.suggested(self.users[1]), [(self.users[2].pk, 1)])
+        self.assertEqual(self.suggested(self.users[2]), [(self.users[1].pk, 1)])
+        self.assertEqual(self.suggested(self.users[4]), [(self.users[0].pk, 1)])
+        self.assertFalse(FollowChange.objects.exists())
+
+        out = StringIO()
+        call_command("build_suggestions", stdout=out)
+        self.assertIn("Updated the suggestions of 0 user(s).", out.getvalue())
+
+    def test_success_follow_suggested(self):
+        call_command("build_suggestions", "--full", stdout=StringIO())
+        self.client.post(reverse("accounts:follow", kwargs={"username": self.users[3].username}))
+        call_command("build_suggestions", stdout=StringIO())
+        self.assertEqual(self.suggested(self.user), [(self.users[4].pk, 1)])
+
+    def test_success_get_home(self):
+        call_command("build_suggestions", "--full", stdout=StringIO())
+        response = self.client.get(reverse("tweets:home"))
+        self.assertEqual(response.context["suggestion_list"], [self.users[3], self.users[4]])
+        self.assertContains(response, "共通のフォロー 2人")
+
+    def test_success_get_profile_modified(self):
+        url = reverse("accounts:user_profile", kwargs={"username": self.users[1].username})
+        self.client.get(url)
+        etag = self.client.get(url)["ETag"]
+        call_command("build_suggestions", "--full", stdout=StringIO())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["suggestion_list"], [self.users[3], self.users[4]])
+
+
+class TestExportView(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.client.login(username="testuser1", password="testpassword1")
+        self.post1 = Tweet.objects.create(user=self.user1, content="testpost1")
+        self.post2 = Tweet.objects.create(user=self.user2, content="テスト")
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+        Like.objects.create(tweet=self.post2, user=self.user1)
+        self.url = reverse("accounts:export", kwargs={"username": self.user1.username})
+
+    def test_success_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="testuser1.jsonl"')
+        records = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(
+            [
+                {key: value for key, value in record.items() if key not in ("created_at", "date_joined")}
+                for record in records
+            ],
+            [
+                {"type": "user", "username": "testuser1", "email": "test1@test.com"},
+                {"type": "tweet", "id": self.post1.pk, "username": "testuser1", "content": "testpost1"},
+                {"type": "follow", "follower": "testuser1", "following": "testuser2"},
+                {"type": "follow", "follower": "testuser2", "following": "testuser1"},
+                {"type": "like", "username": "testuser1", "tweet_id": self.post2.pk},
+            ],
+        )
+
+    def test_success_get_csv(self):
+        response = self.client.get(self.url, {"format": "csv"})
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([row["type"] for row in rows], ["user", "tweet", "follow", "follow", "like"])
+        self.assertEqual(rows[1]["content"], "testpost1")
+
+        stdout = StringIO()
+        call_command("export_user_data", "testuser1", format="csv", chunk_size=1, stdout=stdout)
+        self.assertEqual(list(csv.DictReader(StringIO(stdout.getvalue()))), rows)
+
+    async def test_success_get_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.user1)
+        response = await self.async_client.get(self.url, {"format": "csv"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, AsyncStreamingHttpResponse)
+        content = b"".join([part async for part in response]).decode()
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual([row["type"] for row in rows], ["user", "tweet", "follow", "follow", "like"])
+
+    def test_failure_get_other_user(self):
+        response = self.client.get(reverse("accounts:export", kwargs={"username": self.user2.username}))
+        self.assertEqual(response.status_code, 403)
+
+    def test_failure_get_invalid_format(self):
+        response = self.client.get(self.url, {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("無効な形式です。", [message.message for message in get_messages(response.wsgi_request)])
+
+    def test_failure_command_missing_user(self):
+        with self.assertRaisesMessage(CommandError, "User nobody does not exist."):
+            call_command("export_user_data", "nobody", stdout=StringIO())
+
+
+@override_settings(
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    AUTHENTICATION_BACKENDS=["accounts.backends.CachedModelBackend"],
+)
+class TestCachedModelBackend(TestCase):
+    def setUp(self):
+        self.url = reverse("tweets:home")
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.client.login(username="testuser", password="testpassword")
+        self.client.get(self.url)
+
+    def test_success_cached_user(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.context["user"], self.user)
+        tables = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertNotIn("accounts_user", tables)
+        self.assertNotIn("django_session", tables)
+
+    def test_success_cached_without_password(self):
+        self.assertNotIn(self.user.password, repr(cache.get(user_key(self.user.pk))))
+        user = CachedModelBackend().get_user(self.user.pk)
+        self.assertEqual(user.get_deferred_fields(), {"password"})
+        self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password("testpassword"))
+
+    def test_success_save_user(self):
+        User.objects.filter(pk=self.user.pk).update(username="renamed")
+        self.assertEqual(self.client.get(self.url).context["user"].username, "testuser")
+        self.user.username = "renamed"
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).context["user"].username, "renamed")
+
+    def test_success_change_password(self):
+        self.user.set_password("newpassword")
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f"{reverse(settings.LOGIN_URL)}?next={self.url}")
+
+    def test_success_logout(self):
+        User.objects.filter(pk=self.user.pk).update(username="renamed")
+        self.client.get(reverse("accounts:logout"))
+        self.client.login(username="renamed", password="testpassword")
+        self.assertEqual(self.client.get(self.url).context["user"].username, "renamed")
+
+
+class TestSessionCacheCheck(TestCase):
+    def test_success_default(self):
+        self.assertEqual(check_session_cache(None), [])
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+        AUTHENTICATION_BACKENDS=["accounts.backends.CachedModelBackend"],
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}},
+    )
+    def test_success_shared_cache(self):
+        self.assertEqual(check_session_cache(None), [])
+
+    @override_settings(
+        SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+        AUTHENTICATION_BACKENDS=["accounts.backends.CachedModelBackend"],
+    )
+    def test_failure_process_local_cache(self):
+        self.assertEqual([error.id for error in check_session_cache(None)], ["accounts.E001", "accounts.E002"])
+
+
+class TestQueryPlan(QueryPlanTestMixin, TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.client.login(username="testuser1", password="testpassword1")
+        Tweet.objects.create(user=self.user2, content="testpost")
+
+    def test_profile(self):
+        self.assertIndexedQueries("get", reverse("accounts:user_profile", kwargs={"username": self.user2.username}))
+
+    def test_follow_and_unfollow(self):
+        self.assertIndexedQueries("post", reverse("accounts:follow", kwargs={"username": self.user2.username}))
+        self.assertIndexedQueries("post", reverse("accounts:unfollow", kwargs={"username": self.user2.username}))
+
+    def test_following_list(self):
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+        self.assertIndexedQueries("get", reverse("accounts:following_list", kwargs={"username": self.user2.username}))
+
+    def test_follower_list(self):
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        self.assertIndexedQueries("get", reverse("accounts:follower_list", kwargs={"username": self.user2.username}))
+
+    def test_export(self):
+        Tweet.objects.create(user=self.user1, content="testpost")
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+        Like.objects.create(user=self.user1, tweet=Tweet.objects.get(user=self.user2))
+        for output_format in export.FORMATS:
+            self.assertIndexedQueries(
+                "get", reverse("accounts:export", kwargs={"username": self.user1.username}), {"format": output_format}
+            )
+
+
+class TestQueryBudget(QueryBudgetTestMixin, TestCase):
+    def test_signup(self):
+        self.assertConstantQueries("get", reverse("accounts:signup"))
+
+    def test_login(self):
+        self.assertConstantQueries("get", reverse("accounts:login"))
+
+    def test_own_profile(self):
+        self.assertConstantQueries("get", reverse("accounts:user_profile", kwargs={"username": self.user.username}))
+
+    def test_other_profile(self):
+        self.assertConstantQueries(
+            "get", lambda scale: reverse("accounts:user_profile", kwargs={"username": self.make_user().username})
+        )
+
+    def test_follow(self):
+        self.assertConstantQueries(
+            "post", lambda scale: reverse("accounts:follow", kwargs={"username": self.make_user().username})
+        )
+
+    def test_unfollow(self):
+        self.assertConstantQueries(
+            "post",
+            lambda scale: reverse("accounts:unfollow", kwargs={"username": self.make_user(followed=True).username}),
+        )
+
+    def test_following_list(self):
+        self.assertConstantQueries("get", reverse("accounts:following_list", kwargs={"username": self.user.username}))
+
+    def test_follower_list(self):
+        self.assertConstantQueries("get", reverse("accounts:follower_list", kwargs={"username": self.user.username}))
+
+    def test_export(self):
+        self.assertConstantQueries("get", reverse("accounts:export", kwargs={"username": self.user.username}))
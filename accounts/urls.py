@@ -1,5 +1,7 @@
 from django.urls import path
 
+from mysite.views import SettingSwitchView
+
 from . import views
 
 app_name = "accounts"
@@ -9,8 +11,6 @@ urlpatterns = [
     path("login/", views.UserLoginView.as_view(), name="login"),
     path("logout/", views.UserLogoutView.as_view(), name="logout"),
     path("<str:username>/", views.UserProfileView.as_view(), name="user_profile"),
-    path("<str:username>/follow/", views.FollowView.as_view(), name="follow"),
-    path("<str:username>/unfollow/", views.UnFollowView.as_view(), name="unfollow"),
     path(
         "<str:username>/following_list/",
         views.FollowingListView.as_view(),
@@ -21,4 +21,15 @@ urlpatterns = [
         views.FollowerListView.as_view(),
         name="follower_list",
     ),
+    path("<str:username>/export/", views.ExportView.as_view(), name="export"),
+    path(
+        "<str:username>/follow/",
+        SettingSwitchView("ASYNC_VIEWS", views.FollowView.as_view(), views.AsyncFollowView.as_view()),
+        name="follow",
+    ),
+    path(
+        "<str:username>/unfollow/",
+        SettingSwitchView("ASYNC_VIEWS", views.UnFollowView.as_view(), views.AsyncUnFollowView.as_view()),
+        name="unfollow",
+    ),
 ]
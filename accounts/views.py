@@ -1,18 +1,31 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, get_user_model, login
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import LoginView, LogoutView
-from django.db.models import Count, Prefetch
-from django.http import HttpResponseBadRequest
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Subquery
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import HttpResponseRedirect, get_object_or_404, render
 from django.urls import reverse, reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.http import condition
 from django.views.generic import CreateView, DetailView, ListView
 
-from tweets.models import Like, Tweet
+from mysite.handlers import AsyncStreamingHttpResponse
+from tweets import cards, timeline
+from tweets.models import Tweet
+from tweets.pagination import KeysetPaginationMixin
 
+from . import export, suggestions
 from .forms import LoginForm, SignUpForm
-from .models import FriendShip
+from .mixins import AsyncLoginRequiredMixin
+from .models import FriendShip, Suggestion
 
 User = get_user_model()
 
@@ -46,34 +59,81 @@ class UserLogoutView(LogoutView):
     pass
 
 
+def user_profile_etag(request, *args, **kwargs):
+    """
+    Covers everything the profile shows in one query: the follow counts, the user's tweets
+    (their count catches deletions, the newest updated_at new likes), whether the viewer
+    follows the user, the viewer's suggestions, and the viewer's CSRF secret for the follow form.
+    """
+    tweets = Tweet.objects.filter(user=OuterRef("pk")).order_by().values("user")
+    suggested = Suggestion.objects.filter(user=request.user).order_by().values("user")
+    states = (
+        User.objects.filter(username=kwargs["username"])
+        .annotate(
+            tweet_count=Subquery(tweets.annotate(count=Count("pk")).values("count")),
+            tweets_updated_at=Subquery(tweets.annotate(updated_at=Max("updated_at")).values("updated_at")),
+            is_following=Exists(FriendShip.objects.filter(following=OuterRef("pk"), follower=request.user)),
+            suggestion_count=Subquery(suggested.annotate(count=Count("pk")).values("count")),
+            suggestions_created_at=Subquery(suggested.annotate(created_at=Max("created_at")).values("created_at")),
+        )
+        .values_list(
+            "pk",
+            "followers_count",
+            "followings_count",
+            "tweet_count",
+            "tweets_updated_at",
+            "is_following",
+            "suggestion_count",
+            "suggestions_created_at",
+        )
+    )
+    state = next(iter(states), None)
+    if state is None:
+        return None
+    value = repr((state, request.user.pk, request.META.get("CSRF_COOKIE")))
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+
+@method_decorator(condition(etag_func=user_profile_etag), name="get")
 class UserProfileView(LoginRequiredMixin, DetailView):
     template_name = "accounts/profile.html"
     model = User
     context_object_name = "user"
     slug_field = "username"
     slug_url_kwarg = "username"
+    read_from_replica = True
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.object
-        tweet_list = (
-            Tweet.objects.select_related("user")
-            .filter(user=user)
-            .annotate(like_num=Count("like"))
-            .order_by("-created_at")
-            .prefetch_related(
-                Prefetch("like_set", queryset=Like.objects.filter(user=self.request.user), to_attr="liked")
-            )
-        )
+        tweet_list = list(Tweet.objects.select_related("user").filter(user=user).order_by("-created_at"))
 
         context["tweet_list"] = tweet_list
+        context["card_list"] = cards.render_cards(tweet_list)
         context["is_following"] = FriendShip.objects.filter(following=user, follower=self.request.user).exists()
-        context["followings_num"] = FriendShip.objects.filter(follower=user).count()
-        context["followers_num"] = FriendShip.objects.filter(following=user).count()
+        context["followings_num"] = user.followings_count
+        context["followers_num"] = user.followers_count
+        context["suggestion_list"] = suggestions.for_user(self.request.user)
 
         return context
 
 
+def _follow(follower, following):
+    with transaction.atomic():
+        FriendShip.objects.create(following=following, follower=follower)
+        User.objects.filter(pk=following.pk).update(followers_count=F("followers_count") + 1)
+        User.objects.filter(pk=follower.pk).update(followings_count=F("followings_count") + 1)
+    timeline.backfill(follower, following)
+
+
+def _unfollow(follower, following):
+    with transaction.atomic():
+        deleted, _ = FriendShip.objects.filter(following=following, follower=follower).delete()
+        User.objects.filter(pk=following.pk).update(followers_count=F("followers_count") - deleted)
+        User.objects.filter(pk=follower.pk).update(followings_count=F("followings_count") - deleted)
+    timeline.prune(follower, following)
+
+
 class FollowView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         following = get_object_or_404(User, username=self.kwargs["username"])
@@ -81,13 +141,13 @@ class FollowView(LoginRequiredMixin, View):
 
         if following == follower:
             messages.warning(request, "自分自身はフォローできません。")
-            return HttpResponseBadRequest(render(self.request, "error/400.html"))
+            return render(self.request, "error/400.html", status=400)
 
         if FriendShip.objects.filter(following=following, follower=follower).exists():
             messages.warning(request, "すでにフォローしています。")
-            return HttpResponseBadRequest(render(self.request, "error/400.html"))
+            return render(self.request, "error/400.html", status=400)
 
-        FriendShip.objects.create(following=following, follower=follower)
+        _follow(follower, following)
         return HttpResponseRedirect(reverse("tweets:home"))
 
 
@@ -99,29 +159,128 @@ class UnFollowView(LoginRequiredMixin, View):
 
         if following == follower:
             messages.warning(request, "自分自身を対象には出来ません。")
-            return HttpResponseBadRequest(render(self.request, "error/400.html"))
+            return render(self.request, "error/400.html", status=400)
 
         elif unfollow.exists():
-            unfollow.delete()
+            _unfollow(follower, following)
             return HttpResponseRedirect(reverse("tweets:home"))
         else:
             messages.warning(request, "無効な操作です。")
-            return HttpResponseBadRequest(render(self.request, "error/400.html"))
+            return render(self.request, "error/400.html", status=400)
 
 
-class FollowingListView(LoginRequiredMixin, ListView):
-    template_name = "accounts/following_list.html"
-    context_object_name = "following_list"
+class AsyncFollowView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, *args, **kwargs):
+        try:
+            following = await User.objects.aget(username=self.kwargs["username"])
+        except User.DoesNotExist:
+            raise Http404
+        follower = request.user
+
+        if following == follower:
+            messages.warning(request, "自分自身はフォローできません。")
+            return render(self.request, "error/400.html", status=400)
+
+        if await FriendShip.objects.filter(following=following, follower=follower).aexists():
+            messages.warning(request, "すでにフォローしています。")
+            return render(self.request, "error/400.html", status=400)
+
+        await sync_to_async(_follow)(follower, following)
+        return HttpResponseRedirect(reverse("tweets:home"))
+
+
+class AsyncUnFollowView(AsyncLoginRequiredMixin, View):
+    async def post(self, request, *args, **kwargs):
+        try:
+            following = await User.objects.aget(username=self.kwargs["username"])
+        except User.DoesNotExist:
+            raise Http404
+        follower = request.user
+
+        if following == follower:
+            messages.warning(request, "自分自身を対象には出来ません。")
+            return render(self.request, "error/400.html", status=400)
+
+        elif await FriendShip.objects.filter(following=following, follower=follower).aexists():
+            await sync_to_async(_unfollow)(follower, following)
+            return HttpResponseRedirect(reverse("tweets:home"))
+        else:
+            messages.warning(request, "無効な操作です。")
+            return render(self.request, "error/400.html", status=400)
+
+
+class FriendShipListMixin(LoginRequiredMixin, KeysetPaginationMixin):
+    """
+    Lists one side of a user's friendships a page at a time, and marks every row with whether
+    the viewer follows the listed user and is followed by them, looked up for the whole page
+    in one query.
+    """
+
+    read_from_replica = True
+    owner_field = None
+    listed_field = None
+
+    def get_paginate_by(self, queryset):
+        return settings.FOLLOW_LIST_PAGE_SIZE
 
     def get_queryset(self):
         user = get_object_or_404(User, username=self.kwargs["username"])
-        return FriendShip.objects.select_related("following").filter(follower=user).order_by("-created_at")
+        return FriendShip.objects.select_related(self.listed_field).filter(**{self.owner_field: user})
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, friendships, is_paginated = super().paginate_queryset(queryset, page_size)
+        viewer = self.request.user
+        listed_pks = [getattr(friendship, f"{self.listed_field}_id") for friendship in friendships]
+        relations = set()
+        if listed_pks:
+            relations = set(
+                FriendShip.objects.filter(
+                    Q(follower=viewer, following__in=listed_pks) | Q(follower__in=listed_pks, following=viewer)
+                ).values_list("follower_id", "following_id")
+            )
+        for friendship, listed_pk in zip(friendships, listed_pks):
+            friendship.you_follow = (viewer.pk, listed_pk) in relations
+            friendship.follows_you = (listed_pk, viewer.pk) in relations
+        return (paginator, page, friendships, is_paginated)
+
+
+class FollowingListView(FriendShipListMixin, ListView):
+    template_name = "accounts/following_list.html"
+    context_object_name = "following_list"
+    owner_field = "follower"
+    listed_field = "following"
 
 
-class FollowerListView(LoginRequiredMixin, ListView):
+class FollowerListView(FriendShipListMixin, ListView):
     template_name = "accounts/follower_list.html"
     context_object_name = "follower_list"
+    owner_field = "following"
+    listed_field = "follower"
 
-    def get_queryset(self):
-        user = get_object_or_404(User, username=self.kwargs["username"])
-        return FriendShip.objects.select_related("follower").filter(following=user).order_by("-created_at")
+
+class ExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Streams the viewer's own tweets, follows and likes as JSONL or CSV. The rows are read while
+    the response is sent, after ReplicaMiddleware has returned, so they come from the primary.
+    Under ASGI they are read in chunks off the event loop, by arender().
+    """
+
+    def test_func(self):
+        return self.request.user.username == self.kwargs["username"]
+
+    def get(self, request, *args, **kwargs):
+        output_format = request.GET.get("format", "jsonl")
+        if output_format not in export.FORMATS:
+            messages.warning(request, "無効な形式です。")
+            return render(self.request, "error/400.html", status=400)
+
+        if isinstance(request, ASGIRequest):
+            response = AsyncStreamingHttpResponse(
+                export.arender(request.user, output_format), content_type=export.FORMATS[output_format]
+            )
+        else:
+            response = StreamingHttpResponse(
+                export.render(request.user, output_format), content_type=export.FORMATS[output_format]
+            )
+        response["Content-Disposition"] = f'attachment; filename="{request.user.username}.{output_format}"'
+        return response
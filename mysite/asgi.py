@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from mysite.handlers import ASGIHandler
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+# Every request runs in a thread of its own under ASGI, so its connections cannot be reused.
+os.environ.setdefault("DJANGO_CONN_MAX_AGE", "0")
+
+# As get_asgi_application(), with the handler that can send AsyncStreamingHttpResponse.
+django.setup(set_prefix=False)
+django_application = ASGIHandler()
+
+from tweets.stream import TweetStreamApplication  # noqa: E402 (needs the app registry)
 
-application = get_asgi_application()
+application = TweetStreamApplication(django_application)
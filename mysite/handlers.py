@@ -0,0 +1,36 @@
+from django.core.handlers.asgi import ASGIHandler as BaseASGIHandler
+from django.http import StreamingHttpResponse
+
+
+class AsyncStreamingHttpResponse(StreamingHttpResponse):
+    """
+    StreamingHttpResponse over an async iterator, for views that read the rows of the body
+    from the database under ASGI. Django 4.1 iterates a streaming body synchronously on the
+    event loop, where the ORM refuses to run, so the body is only sent by ASGIHandler below
+    and iterating it synchronously yields nothing.
+    """
+
+    def __init__(self, streaming_content, *args, **kwargs):
+        super().__init__((), *args, **kwargs)
+        self._async_iterator = aiter(streaming_content)
+
+    async def __aiter__(self):
+        async for part in self._async_iterator:
+            yield self.make_bytes(part)
+
+
+class ASGIHandler(BaseASGIHandler):
+    """ASGIHandler that also sends the body of an AsyncStreamingHttpResponse, before the closing message."""
+
+    async def send_response(self, response, send):
+        if not isinstance(response, AsyncStreamingHttpResponse):
+            return await super().send_response(response, send)
+
+        async def send_with_body(message):
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                async for part in response:
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send(message)
+
+        await super().send_response(response, send_with_body)
@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .routers import choose_replica, replica
+
+logger = logging.getLogger("mysite.timing")
+
+
+class RequestTiming:
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.render_start = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def render_finished(self, response):
+        self.render = time.perf_counter() - self.render_start
+
+
+class ServerTimingMiddleware:
+    """
+    Counts queries and DB time with connection.execute_wrapper, times template rendering
+    and the whole request, and reports them in a Server-Timing header and a log line.
+    Only SERVER_TIMING_SAMPLE_RATE of the requests are measured.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Same switch as django.utils.deprecation.MiddlewareMixin, so that async views do not
+        # fall back to a thread per request because of this middleware.
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        else:
+            self._is_coroutine = None
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timing = request._server_timing = RequestTiming()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self.wrap_connections(stack, timing)
+            response = self.get_response(request)
+        return self.report(request, response, timing, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        # The ORM runs in the request's thread-sensitive executor thread, whose connections
+        # are not the ones of the event loop thread.
+        timing = request._server_timing = RequestTiming()
+        start = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(self.wrap_connections)(stack, timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.report(request, response, timing, time.perf_counter() - start)
+
+    def wrap_connections(self, stack, timing):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timing))
+
+    def report(self, request, response, timing, total):
+        response["Server-Timing"] = ", ".join(
+            [
+                f'db;dur={timing.db * 1000:.2f};desc="{timing.queries} queries"',
+                f"render;dur={timing.render * 1000:.2f}",
+                f"total;dur={total * 1000:.2f}",
+            ]
+        )
+        logger.info(
+            "method=%s path=%s status=%s total_ms=%.2f db_ms=%.2f queries=%d render_ms=%.2f",
+            request.method,
+            request.path,
+            response.status_code,
+            total * 1000,
+            timing.db * 1000,
+            timing.queries,
+            timing.render * 1000,
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "total_ms": total * 1000,
+                "db_ms": timing.db * 1000,
+                "queries": timing.queries,
+                "render_ms": timing.render * 1000,
+            },
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        timing = getattr(request, "_server_timing", None)
+        if timing is not None:
+            timing.render_start = time.perf_counter()
+            response.add_post_render_callback(timing.render_finished)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Sends the reads of GET and HEAD requests to views with read_from_replica = True to a
+    replica, and pins the client to the primary for PRIMARY_PIN_SECONDS after any other
+    request, so that it reads its own writes while the replica catches up.
+    """
+
+    sync_capable = True
+    async_capable = True
+    pin_cookie = "pin_primary"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        else:
+            self._is_coroutine = None
+
+    def __call__(self, request):
+        if self._is_coroutine:
+            return self.__acall__(request)
+        token = replica.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = replica.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica.reset(token)
+        return self.pin(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        if (
+            getattr(view_class, "read_from_replica", False)
+            and request.method in ("GET", "HEAD")
+            and self.pin_cookie not in request.COOKIES
+        ):
+            # Stays set until __call__ returns, so that lazy template rendering reads from it too.
+            replica.set(choose_replica())
+
+    def pin(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(
+                self.pin_cookie, "1", max_age=settings.PRIMARY_PIN_SECONDS, httponly=True, samesite="Lax"
+            )
+        return response
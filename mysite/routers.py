@@ -0,0 +1,36 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# The alias reads go to during the current request, set by ReplicaMiddleware for views with
+# read_from_replica = True. None means the primary.
+replica = ContextVar("replica", default=None)
+
+
+def choose_replica():
+    return random.choice(settings.DATABASE_REPLICAS) if settings.DATABASE_REPLICAS else None
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes, migrations and sessions always use the primary. Other reads use the replica
+    chosen for the request, if any. Replicas are copies of the primary, so relations between
+    objects read from either are allowed.
+    """
+
+    def db_for_read(self, model, **hints):
+        # A session created a moment ago may not be on the replica yet.
+        if model._meta.app_label == "sessions":
+            return DEFAULT_DB_ALIAS
+        return replica.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "mysite.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -50,6 +52,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "mysite.middleware.ReplicaMiddleware",
 ]
 
 ROOT_URLCONF = "mysite.urls"
@@ -78,11 +81,62 @@ WSGI_APPLICATION = "mysite.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
+        "ENGINE": "mysite.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        # Connections are kept between requests and checked before being reused. mysite.asgi
+        # turns this off.
+        "CONN_MAX_AGE": int(os.environ.get("DJANGO_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Readers and the writer do not block each other in WAL mode, and NORMAL only
+            # syncs at checkpoints, which is durable there. Writers queue for up to 5 seconds.
+            "pragmas": {
+                "journal_mode": "wal",
+                "synchronous": "normal",
+                "busy_timeout": 5000,
+                "cache_size": -20000,
+                "mmap_size": 128 * 1024 * 1024,
+                "temp_store": "memory",
+            },
+            "transaction_mode": "IMMEDIATE",
+        },
+        # A file instead of the shared in-memory database, which fails with "database table is locked"
+        # as soon as two threads write at the same time.
+        "TEST": {
+            "NAME": BASE_DIR / "test_db.sqlite3",
+        },
+    },
+    # A copy of the primary, refreshed by "manage.py sync_replica --interval N". Only used when
+    # listed in DATABASE_REPLICAS.
+    "replica": {
+        "ENGINE": "mysite.sqlite3",
+        "NAME": BASE_DIR / "replica.sqlite3",
+        "CONN_MAX_AGE": int(os.environ.get("DJANGO_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "pragmas": {
+                "journal_mode": "wal",
+                "busy_timeout": 5000,
+                "cache_size": -20000,
+                "mmap_size": 128 * 1024 * 1024,
+                "temp_store": "memory",
+                "query_only": "on",
+            },
+        },
+        "TEST": {
+            "MIRROR": "default",
+        },
+    },
 }
 
+DATABASE_ROUTERS = ["mysite.routers.PrimaryReplicaRouter"]
+
+# Aliases that views with read_from_replica = True read from, e.g. DJANGO_DATABASE_REPLICAS=replica.
+DATABASE_REPLICAS = [alias for alias in os.environ.get("DJANGO_DATABASE_REPLICAS", "").split(",") if alias]
+
+# Seconds a client reads from the primary after a write. Has to cover the replica's lag.
+PRIMARY_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -131,10 +185,120 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "accounts.CustomUser"
 
+# Redis shared by every process, e.g. redis://127.0.0.1:6379/0, which needs the redis package.
+# Without it every process has a LocMemCache of its own.
+REDIS_URL = os.environ.get("DJANGO_REDIS_URL")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        },
+    }
+
+# With a shared cache, sessions and the user of each session are read from the cache, so
+# authentication costs no query once both are cached. Cached users are dropped on save, which
+# only logs out the sessions of every process after a password change when they share the
+# cache, so accounts.checks refuses these with a per-process cache. Users are cached without
+# the password hash.
+if REDIS_URL:
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    AUTHENTICATION_BACKENDS = ["accounts.backends.CachedModelBackend"]
+else:
+    SESSION_ENGINE = "django.contrib.sessions.backends.db"
+    AUTHENTICATION_BACKENDS = ["django.contrib.auth.backends.ModelBackend"]
+USER_CACHE_TIMEOUT = 60 * 5
+
 LOGIN_URL = "accounts:login"
 LOGIN_REDIRECT_URL = "tweets:home"
 LOGOUT_REDIRECT_URL = "accounts:login"
 
+TIMELINE_PAGE_SIZE = 20
+TIMELINE_INBOX_SIZE = 800
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+# Answer tweets:timeline with an ETag, so that polling clients get a 304. The ETag includes
+# versions kept in the cache, which other processes only see in a shared cache.
+TIMELINE_ETAGS = bool(REDIS_URL)
+
+# Users per page of accounts:following_list and accounts:follower_list.
+FOLLOW_LIST_PAGE_SIZE = 50
+
+# Friend-of-friend suggestions kept per user by build_suggestions, and shown on a page.
+SUGGESTION_LIMIT = 20
+SUGGESTION_BATCH_SIZE = 1000
+SUGGESTIONS_SHOWN = 5
+
+# Rows fetched per query while streaming an account export.
+EXPORT_CHUNK_SIZE = 2000
+
+# tweets:trending shows the TRENDING_SIZE tweets with the most likes in the last
+# TRENDING_WINDOW_MINUTES, a like losing half its weight every TRENDING_HALF_LIFE_MINUTES.
+TRENDING_SIZE = 50
+TRENDING_WINDOW_MINUTES = 60
+TRENDING_HALF_LIFE_MINUTES = 15
+TRENDING_ROLLUP_CHUNK_SIZE = 2000
+
+# Tweets per page of tweets:search results.
+SEARCH_PAGE_SIZE = 20
+
+# Rendered tweet cards are keyed by Tweet.updated_at, so they only expire to free memory.
+TWEET_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Largest number of tweets LikeStateView answers for in one request.
+LIKE_STATE_MAX_IDS = 100
+
+# Buffer likes and unlikes in the cache and apply them with the flush_likes command. This needs
+# a cache shared by every process with atomic incr(), such as Redis. flush_likes runs in a
+# process of its own, so tweets.checks refuses it with LocMemCache.
+LIKE_WRITE_BEHIND = False
+LIKE_WRITE_BEHIND_BATCH_SIZE = 1000
+# How long the liked state a user has just set overrides the database; flush_likes has to run
+# more often than that. A flush that runs longer than the lock timeout may overlap the next one.
+LIKE_WRITE_BEHIND_TIMEOUT = 60 * 60
+LIKE_WRITE_BEHIND_LOCK_TIMEOUT = 60 * 10
+
+# Route the like, like-state and follow endpoints to their async views. Only useful when the
+# site is served through mysite.asgi.
+ASYNC_VIEWS = False
+
+# Seconds between keep-alive comments on an idle tweets:stream connection under ASGI, and the
+# milliseconds browsers wait before reconnecting to it under WSGI.
+TWEET_STREAM_HEARTBEAT = 15
+TWEET_STREAM_RETRY = 3000
+
+# Fraction of requests measured by ServerTimingMiddleware. Set it to 0 to disable the instrumentation.
+SERVER_TIMING_SAMPLE_RATE = 1.0
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "require_debug_true": {
+            "()": "django.utils.log.RequireDebugTrue",
+        },
+    },
+    "handlers": {
+        "timing": {
+            "filters": ["require_debug_true"],
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "mysite.timing": {
+            "handlers": ["timing"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
 SQL_DEBUG = False
 
 if SQL_DEBUG:
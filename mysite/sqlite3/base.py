@@ -0,0 +1,42 @@
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = {"DEFERRED", "IMMEDIATE", "EXCLUSIVE"}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    The sqlite3 backend with two more OPTIONS, which are not passed to sqlite3.connect():
+
+    - ``pragmas``: PRAGMA name/value pairs set on every new connection, e.g. journal_mode
+      and busy_timeout. Only journal_mode is stored in the database file.
+    - ``transaction_mode``: how atomic() begins a transaction. With IMMEDIATE a writer takes
+      the write lock up front and waits for it under busy_timeout, instead of failing with
+      "database is locked" when a read lock cannot be upgraded.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        pragmas = params.pop("pragmas", {})
+        for name, value in pragmas.items():
+            if not re.fullmatch(r"[a-z_]+", name) or not re.fullmatch(r"-?\w+", str(value)):
+                raise ImproperlyConfigured(f"Invalid SQLite pragma in DATABASES OPTIONS: {name} = {value!r}.")
+        mode = params.pop("transaction_mode", "DEFERRED").upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"DATABASES OPTIONS transaction_mode must be one of {', '.join(sorted(TRANSACTION_MODES))}."
+            )
+        self.pragmas = pragmas
+        self.transaction_mode = mode
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {self.transaction_mode}")
@@ -0,0 +1,128 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import FriendShip
+from tweets.models import Inbox, Like, Tweet
+
+User = get_user_model()
+
+FULL_SCAN = re.compile(r"\bSCAN (?!CONSTANT ROW)|USE TEMP B-TREE")
+# FTS5 reports the tweets it finds for a MATCH in its index as a scan of the virtual table.
+FULL_TEXT_MATCH = re.compile(r"\bSCAN \S+ VIRTUAL TABLE INDEX \d+:M")
+
+
+class QueryPlanTestMixin:
+    """
+    Runs EXPLAIN QUERY PLAN for every query a request executes and fails when SQLite
+    has to scan a whole table or sort the rows in a temporary B-tree. A full-text query
+    may sort its matches, as ranking them by relevance takes.
+    """
+
+    def assertIndexedQueries(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+        for query in context.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [row[3] for row in cursor.fetchall()]
+            if any(FULL_TEXT_MATCH.search(detail) for detail in plan):
+                plan = [detail for detail in plan if not FULL_TEXT_MATCH.search(detail)]
+                plan = [detail for detail in plan if detail != "USE TEMP B-TREE FOR ORDER BY"]
+            if any(FULL_SCAN.search(detail) for detail in plan):
+                self.fail(f"Unindexed query on {method.upper()} {url}:\n{sql}\n\n" + "\n".join(plan))
+        return response
+
+
+class QueryBudgetTestMixin:
+    """
+    Grows the data around ``self.user`` through ``scales`` (followings, followers, tweets,
+    likes and inbox rows) and asserts that a request runs the same number of queries at
+    every scale, so that N+1 regressions fail with the SQL that was added.
+    """
+
+    scales = (1, 10, 100)
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user(username="budgetuser", email="budget@test.com", password="testpassword")
+        self.client.login(username="budgetuser", password="testpassword")
+        # Budgets are for the steady state, in which the session and the user are cached when
+        # a shared cache is configured.
+        self.client.get(reverse("tweets:home"))
+        self.seeded_users = []
+        self.other_users = 0
+
+    def seed(self, scale):
+        users = User.objects.bulk_create(
+            [User(username=f"seeduser{i}", email=f"seed{i}@test.com") for i in range(len(self.seeded_users), scale)]
+        )
+        FriendShip.objects.bulk_create(
+            [FriendShip(follower=self.user, following=user) for user in users]
+            + [FriendShip(follower=user, following=self.user) for user in users]
+        )
+        tweets = Tweet.objects.bulk_create(
+            [Tweet(user=user, content="seedpost") for user in users]
+            + [Tweet(user=self.user, content="seedpost") for _ in users]
+        )
+        Inbox.objects.bulk_create(
+            [Inbox(owner=self.user, tweet=tweet, created_at=tweet.created_at) for tweet in tweets]
+        )
+        Like.objects.bulk_create([Like(tweet=tweet, user=self.user) for tweet in tweets])
+        self.seeded_users += users
+
+    def make_tweet(self, liked=False):
+        tweet = Tweet.objects.create(user=self.user, content="budgetpost")
+        likers = self.seeded_users + [self.user] if liked else self.seeded_users
+        Like.objects.bulk_create([Like(tweet=tweet, user=user) for user in likers])
+        Inbox.objects.bulk_create(
+            [Inbox(owner=user, tweet=tweet, created_at=tweet.created_at) for user in [self.user, *self.seeded_users]]
+        )
+        return tweet
+
+    def make_user(self, followed=False):
+        self.other_users += 1
+        user = User.objects.create(username=f"otheruser{self.other_users}", email="other@test.com")
+        Tweet.objects.bulk_create([Tweet(user=user, content="budgetpost") for _ in self.seeded_users])
+        FriendShip.objects.bulk_create(
+            [FriendShip(follower=follower, following=user) for follower in self.seeded_users]
+        )
+        if followed:
+            FriendShip.objects.create(follower=self.user, following=user)
+        return user
+
+    def assertConstantQueries(self, method, url, data=None):
+        """
+        ``url`` may be a callable taking the scale, for requests that need a fresh target. Seeded
+        rows are kept, so each test can make only one such assertion.
+        """
+        if self.seeded_users:
+            raise AssertionError("assertConstantQueries() can only be called once per test.")
+        captured = []
+        for scale in self.scales:
+            self.seed(scale)
+            target = url(scale) if callable(url) else url
+            with CaptureQueriesContext(connection) as context:
+                response = getattr(self.client, method)(target, data)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertLess(response.status_code, 400, f"{method.upper()} {target} failed at scale {scale}.")
+            captured.append((scale, target, context.captured_queries))
+
+        base_scale, _, base_queries = captured[0]
+        for scale, target, queries in captured[1:]:
+            if len(queries) != len(base_queries):
+                self.fail(
+                    f"{method.upper()} {target} ran {len(base_queries)} queries at scale {base_scale} "
+                    f"but {len(queries)} at scale {scale}:\n"
+                    + "\n".join(f"{i}. {query['sql']}" for i, query in enumerate(queries, start=1))
+                )
@@ -0,0 +1,158 @@
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from mysite.handlers import ASGIHandler, AsyncStreamingHttpResponse
+from mysite.routers import PrimaryReplicaRouter
+from mysite.sqlite3.base import DatabaseWrapper
+from tweets import timeline
+from tweets.models import Tweet
+from tweets.views import AsyncLikeView, LikeView
+
+User = get_user_model()
+
+
+class TestServerTimingMiddleware(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.client.login(username="testuser", password="testpassword")
+        self.async_client.force_login(self.user)
+        self.post = Tweet.objects.create(user=self.user, content="testpost")
+
+    def test_success_get(self):
+        with self.assertLogs("mysite.timing", level="INFO") as logs:
+            response = self.client.get(reverse("tweets:detail", kwargs={"pk": self.post.pk}))
+        self.assertEqual(response.status_code, 200)
+        metrics = {metric.split(";")[0]: metric for metric in response["Server-Timing"].split(", ")}
+        self.assertEqual(set(metrics), {"db", "render", "total"})
+        self.assertRegex(metrics["db"], r'^db;dur=\d+\.\d{2};desc="[1-9]\d* queries"$')
+        self.assertRegex(metrics["render"], r"^render;dur=\d+\.\d{2}$")
+        self.assertEqual(logs.records[0].status, 200)
+        self.assertEqual(logs.records[0].path, reverse("tweets:detail", kwargs={"pk": self.post.pk}))
+        self.assertGreater(logs.records[0].queries, 0)
+        self.assertGreater(logs.records[0].render_ms, 0)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_success_get_without_sampling(self):
+        with self.assertNoLogs("mysite.timing"):
+            response = self.client.get(reverse("tweets:detail", kwargs={"pk": self.post.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(ASYNC_VIEWS=True)
+    async def test_success_post_async_view(self):
+        self.assertIs(resolve(reverse("tweets:like", kwargs={"pk": self.post.pk})).func.view_class, AsyncLikeView)
+        with self.assertLogs("mysite.timing", level="INFO") as logs:
+            response = await self.async_client.post(reverse("tweets:like", kwargs={"pk": self.post.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("total;dur=", response["Server-Timing"])
+        self.assertGreater(logs.records[0].queries, 0)
+
+
+class TestSettingSwitchView(TestCase):
+    def test_success_follows_setting(self):
+        view = resolve(reverse("tweets:like", kwargs={"pk": 1})).func
+        self.assertIs(view.view_class, LikeView)
+        self.assertFalse(asyncio.iscoroutinefunction(view))
+        with override_settings(ASYNC_VIEWS=True):
+            self.assertIs(view.view_class, AsyncLikeView)
+            self.assertTrue(asyncio.iscoroutinefunction(view))
+
+
+class TestASGIHandler(SimpleTestCase):
+    async def test_success_send_async_streaming_response(self):
+        async def lines():
+            yield "first\n"
+            yield "second\n"
+
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await ASGIHandler().send_response(AsyncStreamingHttpResponse(lines()), send)
+        self.assertEqual(messages[0]["type"], "http.response.start")
+        self.assertEqual(
+            messages[1:],
+            [
+                {"type": "http.response.body", "body": b"first\n", "more_body": True},
+                {"type": "http.response.body", "body": b"second\n", "more_body": True},
+                {"type": "http.response.body"},
+            ],
+        )
+
+
+class TestSqliteBackend(TransactionTestCase):
+    def test_success_pragmas(self):
+        with connection.cursor() as cursor:
+            for pragma, value in [("journal_mode", "wal"), ("synchronous", 1), ("busy_timeout", 5000)]:
+                cursor.execute(f"PRAGMA {pragma}")
+                self.assertEqual(cursor.fetchone()[0], value)
+
+    def test_success_transaction_mode(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
+
+    def test_failure_invalid_options(self):
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        for options in [{"transaction_mode": "LATER"}, {"pragmas": {"journal_mode": "wal; DROP TABLE x"}}]:
+            wrapper = DatabaseWrapper({**settings_dict, "OPTIONS": options})
+            with self.assertRaises(ImproperlyConfigured):
+                wrapper.get_connection_params()
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class TestReplicaRouting(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.client.login(username="testuser", password="testpassword")
+        self.post = Tweet.objects.create(user=self.user, content="testpost")
+        timeline.fan_out(self.post)
+
+    def get(self, url):
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return primary, replica
+
+    def test_success_read_from_replica(self):
+        for url in [
+            reverse("tweets:home"),
+            reverse("tweets:detail", kwargs={"pk": self.post.pk}),
+            reverse("accounts:user_profile", kwargs={"username": "testuser"}),
+            reverse("accounts:following_list", kwargs={"username": "testuser"}),
+            reverse("accounts:follower_list", kwargs={"username": "testuser"}),
+        ]:
+            primary, replica = self.get(url)
+            self.assertGreater(len(replica), 0, url)
+            self.assertTrue(all("django_session" in query["sql"] for query in primary), url)
+
+    def test_success_read_from_primary(self):
+        _, replica = self.get(reverse("tweets:timeline"))
+        self.assertEqual(len(replica), 0)
+
+        response = self.client.post(reverse("tweets:like", kwargs={"pk": self.post.pk}))
+        self.assertEqual(response.cookies["pin_primary"]["max-age"], 5)
+        _, replica = self.get(reverse("tweets:home"))
+        self.assertEqual(len(replica), 0)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_success_read_from_primary_without_replicas(self):
+        _, replica = self.get(reverse("tweets:home"))
+        self.assertEqual(len(replica), 0)
+
+    def test_success_router(self):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_write(Tweet), "default")
+        self.assertTrue(router.allow_migrate("default", "tweets"))
+        self.assertFalse(router.allow_migrate("replica", "tweets"))
@@ -0,0 +1,26 @@
+from django.conf import settings
+
+
+class SettingSwitchView:
+    """
+    Calls ``async_view`` while the boolean ``setting`` is on and ``sync_view`` otherwise. Other
+    attributes, such as view_class or the coroutine marker of an async view, are read from the
+    view chosen at the time. The handler checks whether the view is a coroutine function for
+    every request, so the choice follows the setting without reloading the URLconf.
+    """
+
+    def __init__(self, setting, sync_view, async_view):
+        self.setting = setting
+        self.sync_view = sync_view
+        self.async_view = async_view
+
+    def get_view(self):
+        return self.async_view if getattr(settings, self.setting) else self.sync_view
+
+    def __getattr__(self, name):
+        if name in ("setting", "sync_view", "async_view"):
+            raise AttributeError(name)
+        return getattr(self.get_view(), name)
+
+    def __call__(self, request, *args, **kwargs):
+        return self.get_view()(request, *args, **kwargs)
@@ -10,40 +10,55 @@ const getCookie = name => {
     return null;
 };
 const csrftoken = getCookie("csrftoken");
+const likeStateUrl = document.currentScript.getAttribute("data-like-state-url");
+
+const setLikeState = (tweet, liked, likeNum) => {
+    const button = tweet.querySelector(".like-btn, .unlike-btn");
+    tweet.querySelector(".like-num").textContent = likeNum;
+    if (liked) {
+        button.textContent = "いいね解除";
+        button.classList.remove("like-btn");
+        button.classList.add("unlike-btn");
+        button.classList.remove("btn-outline-primary");
+        button.classList.add("btn-outline-danger");
+    } else {
+        button.textContent = "いいね";
+        button.classList.remove("unlike-btn");
+        button.classList.add("like-btn");
+        button.classList.remove("btn-outline-danger");
+        button.classList.add("btn-outline-primary");
+    }
+};
+
+// The HTML is the same for every viewer, so the like buttons are filled in after load.
+const likeStateBatchSize = 100;
+const tweets = new Map([...document.querySelectorAll(".tweet")].map(tweet => [tweet.dataset.tweetPk, tweet]));
+const tweetPks = [...tweets.keys()];
+for (let i = 0; i < tweetPks.length; i += likeStateBatchSize) {
+    fetch(likeStateUrl + "?ids=" + tweetPks.slice(i, i + likeStateBatchSize).join(","))
+        .then(response => response.json())
+        .then(response => {
+            response.tweets.forEach(state => {
+                setLikeState(tweets.get(String(state.tweet_pk)), state.liked, state.like_num);
+            });
+        });
+}
 
 document.addEventListener("click", event => {
     if (event.target.matches(".like-btn")) {
-        const likeBtn = event.target;
-        const url = likeBtn.getAttribute("data-like-url");
-        fetch(url, { method: "POST", headers: { "X-CSRFToken": csrftoken } })
+        const tweet = event.target.closest(".tweet");
+        fetch(tweet.dataset.likeUrl, { method: "POST", headers: { "X-CSRFToken": csrftoken } })
             .then(response => response.json())
-            .then(response => {
-                const likeNum = likeBtn.parentNode.querySelector(".like-num");
-                likeNum.textContent = response.like_num;
-                likeBtn.textContent = "いいね解除";
-                likeBtn.classList.remove("like-btn");
-                likeBtn.classList.add("unlike-btn");
-                likeBtn.classList.remove("btn-outline-primary");
-                likeBtn.classList.add("btn-outline-danger");
-            });
+            .then(response => setLikeState(tweet, response.liked, response.like_num));
     }
 });
 
 
 document.addEventListener("click", event => {
     if (event.target.matches(".unlike-btn")) {
-        const unlikeBtn = event.target;
-        const url = unlikeBtn.getAttribute("data-unlike-url");
-        fetch(url, { method: "POST", headers: { "X-CSRFToken": csrftoken } })
+        const tweet = event.target.closest(".tweet");
+        fetch(tweet.dataset.unlikeUrl, { method: "POST", headers: { "X-CSRFToken": csrftoken } })
             .then(response => response.json())
-            .then(response => {
-                const likeNum = unlikeBtn.parentNode.querySelector(".like-num");
-                likeNum.textContent = response.like_num;
-                unlikeBtn.textContent = "いいね";
-                unlikeBtn.classList.remove("unlike-btn");
-                unlikeBtn.classList.add("like-btn");
-                unlikeBtn.classList.remove("btn-outline-danger");
-                unlikeBtn.classList.add("btn-outline-primary");
-            });
+            .then(response => setLikeState(tweet, response.liked, response.like_num));
     }
 });
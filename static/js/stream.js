@@ -0,0 +1,11 @@
+// New tweets of the home timeline arrive as server-sent events. EventSource reconnects on its
+// own and sends the id of the last event, so nothing is missed in between.
+const streamUrl = document.currentScript.getAttribute("data-stream-url");
+const tweetList = document.getElementById("tweet-list");
+
+new EventSource(streamUrl).addEventListener("tweet", event => {
+    const data = JSON.parse(event.data);
+    if (!tweetList.querySelector(`.tweet[data-tweet-pk="${data.tweet_pk}"]`)) {
+        tweetList.insertAdjacentHTML("afterbegin", data.html);
+    }
+});
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+def card_key(tweet):
+    return f"tweets:card:{tweet.pk}:{tweet.updated_at.timestamp()}"
+
+
+def render_cards(tweets):
+    """
+    Returns the HTML of every tweet card, cached under the tweet id and updated_at.
+    Cards do not depend on the viewer; like.js fills in the like buttons.
+    """
+    keys = {card_key(tweet): tweet for tweet in tweets}
+    cards = cache.get_many(keys)
+    missing = {
+        key: render_to_string("tweets/card.html", {"tweet": tweet}) for key, tweet in keys.items() if key not in cards
+    }
+    if missing:
+        cache.set_many(missing, settings.TWEET_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
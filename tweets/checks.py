@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from accounts.checks import process_local_cache
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if not process_local_cache():
+        return []
+    errors = []
+    if settings.TIMELINE_ETAGS:
+        errors.append(
+            Error(
+                "TIMELINE_ETAGS needs a cache shared by every process, or other processes answer "
+                "304 for timelines that have changed.",
+                hint="Set DJANGO_REDIS_URL, or turn TIMELINE_ETAGS off.",
+                id="tweets.E001",
+            )
+        )
+    if settings.LIKE_WRITE_BEHIND:
+        errors.append(
+            Error(
+                "LIKE_WRITE_BEHIND needs a cache shared by every process, or flush_likes loses "
+                "the likes buffered by other processes.",
+                hint="Set DJANGO_REDIS_URL, or turn LIKE_WRITE_BEHIND off.",
+                id="tweets.E002",
+            )
+        )
+    return errors
@@ -0,0 +1,174 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from . import trending
+from .likes import touch_version
+from .models import Like, Tweet
+
+User = get_user_model()
+
+# Likes and unlikes are appended to a log in the cache instead of being written to the
+# database, and flush() applies them later in batches. The cache has to be shared by every
+# process and support atomic incr(), e.g. Redis or Memcached. Intents and the per-tweet
+# pending counters never expire: flush() subtracts exactly what the writers added, so a
+# counter that restarted at 0 would stay off, and below zero, for good.
+SEQUENCE_KEY = "likes:sequence"
+FLUSHED_KEY = "likes:flushed"
+STALLED_KEY = "likes:stalled"
+FLUSH_LOCK_KEY = "likes:flush-lock"
+
+
+def intent_key(seq):
+    return f"likes:intent:{seq}"
+
+
+def state_key(user_pk, tweet_pk):
+    return f"likes:state:{user_pk}:{tweet_pk}"
+
+
+def pending_key(tweet_pk):
+    return f"likes:pending:{tweet_pk}"
+
+
+def _incr(key, delta, timeout):
+    cache.add(key, 0, timeout)
+    return cache.incr(key, delta)
+
+
+def _write(tweet_pk, user, liked):
+    row = (
+        Tweet.objects.filter(pk=tweet_pk)
+        .annotate(liked=Exists(Like.objects.filter(tweet=OuterRef("pk"), user=user)))
+        .values_list("like_count", "liked")
+        .first()
+    )
+    if row is None:
+        return None
+    like_count, was_liked = row
+    cached = cache.get_many([state_key(user.pk, tweet_pk), pending_key(tweet_pk)])
+    was_liked = cached.get(state_key(user.pk, tweet_pk), was_liked)
+    delta = int(liked) - int(was_liked)
+
+    seq = _incr(SEQUENCE_KEY, 1, None)
+    cache.set(intent_key(seq), (tweet_pk, user.pk, liked, delta), None)
+    cache.set(state_key(user.pk, tweet_pk), liked, settings.LIKE_WRITE_BEHIND_TIMEOUT)
+    if delta:
+        touch_version(user.pk)
+        return like_count + _incr(pending_key(tweet_pk), delta, None)
+    return like_count + cached.get(pending_key(tweet_pk), 0)
+
+
+def like(tweet_pk, user):
+    """Returns the optimistic like count, or None when the tweet does not exist."""
+    return _write(tweet_pk, user, True)
+
+
+def unlike(tweet_pk, user):
+    """Returns the optimistic like count, or None when the tweet does not exist."""
+    return _write(tweet_pk, user, False)
+
+
+def apply_pending(user, states):
+    """Overlays the buffered intents on (tweet_pk, like_count, liked) rows read from the database."""
+    keys = [key for tweet_pk, _, _ in states for key in (state_key(user.pk, tweet_pk), pending_key(tweet_pk))]
+    cached = cache.get_many(keys)
+    return [
+        (
+            tweet_pk,
+            like_count + cached.get(pending_key(tweet_pk), 0),
+            cached.get(state_key(user.pk, tweet_pk), liked),
+        )
+        for tweet_pk, like_count, liked in states
+    ]
+
+
+def _apply(intents):
+    final = {}
+    for tweet_pk, user_pk, liked, _ in intents:
+        final[(tweet_pk, user_pk)] = liked
+    tweet_pks = {tweet_pk for tweet_pk, _ in final}
+    user_pks = {user_pk for _, user_pk in final}
+    # Tweets and users deleted since the intent was recorded are dropped.
+    tweet_pks &= set(Tweet.objects.filter(pk__in=tweet_pks).values_list("pk", flat=True))
+    user_pks &= set(User.objects.filter(pk__in=user_pks).values_list("pk", flat=True))
+    existing = set(
+        Like.objects.filter(tweet_id__in=tweet_pks, user_id__in=user_pks).values_list("tweet_id", "user_id")
+    )
+
+    changes = Counter()
+    created = []
+    deleted = defaultdict(list)
+    for (tweet_pk, user_pk), liked in final.items():
+        if tweet_pk not in tweet_pks or user_pk not in user_pks or liked == ((tweet_pk, user_pk) in existing):
+            continue
+        if liked:
+            created.append(Like(tweet_id=tweet_pk, user_id=user_pk))
+        else:
+            deleted[tweet_pk].append(user_pk)
+        changes[tweet_pk] += 1 if liked else -1
+
+    Like.objects.bulk_create(created, ignore_conflicts=True)
+    for tweet_pk, unliked_by in deleted.items():
+        Like.objects.filter(tweet_id=tweet_pk, user_id__in=unliked_by).delete()
+    by_change = defaultdict(list)
+    for tweet_pk, change in changes.items():
+        if change:
+            by_change[change].append(tweet_pk)
+    now = timezone.now()
+    for change, pks in by_change.items():
+        Tweet.objects.filter(pk__in=pks).update(like_count=F("like_count") + change, updated_at=now)
+    # Counted in the minute of the flush rather than of the request.
+    trending.record(changes, now)
+
+
+def flush(batch_size=None):
+    """
+    Applies the buffered intents to the database in order and returns how many were applied.
+    A gap in the log is waited for once, in case its writer has not stored the intent yet,
+    and skipped on the next flush. Returns 0 without applying anything while another flush
+    holds the lock, which would otherwise apply the same intents twice.
+    """
+    if not cache.add(FLUSH_LOCK_KEY, True, settings.LIKE_WRITE_BEHIND_LOCK_TIMEOUT):
+        return 0
+    try:
+        return _flush(batch_size or settings.LIKE_WRITE_BEHIND_BATCH_SIZE)
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def _flush(batch_size):
+    flushed = cache.get(FLUSHED_KEY, 0)
+    last = cache.get(SEQUENCE_KEY, 0)
+    applied = 0
+    stalled = False
+    while flushed < last and not stalled:
+        seqs = range(flushed + 1, min(flushed + batch_size, last) + 1)
+        found = cache.get_many([intent_key(seq) for seq in seqs])
+        intents = []
+        for seq in seqs:
+            if intent_key(seq) not in found and seq != cache.get(STALLED_KEY):
+                cache.set(STALLED_KEY, seq, None)
+                stalled = True
+                break
+            if intent_key(seq) in found:
+                intents.append(found[intent_key(seq)])
+            flushed = seq
+
+        with transaction.atomic():
+            _apply(intents)
+        cache.set(FLUSHED_KEY, flushed, None)
+        cache.delete_many([intent_key(seq) for seq in seqs if seq <= flushed])
+        pending = Counter()
+        for tweet_pk, _, _, delta in intents:
+            pending[tweet_pk] += delta
+        for tweet_pk, delta in pending.items():
+            if delta:
+                _incr(pending_key(tweet_pk), -delta, None)
+        applied += len(intents)
+    return applied
@@ -0,0 +1,75 @@
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import trending
+from .models import Like, Tweet
+
+# The ORM can neither tell whether an ignored insert happened nor return columns from an
+# UPDATE, so each write is two statements of plain SQL inside one transaction, plus the
+# upsert of the trending bucket when the like or unlike happened.
+LIKE_SQL = (
+    "INSERT INTO {like} ({tweet_id}, {user_id}, {created_at}) "
+    "SELECT %s, %s, %s WHERE EXISTS (SELECT 1 FROM {tweet} WHERE {id} = %s) "
+    "ON CONFLICT DO NOTHING"
+)
+UNLIKE_SQL = "DELETE FROM {like} WHERE {tweet_id} = %s AND {user_id} = %s"
+UPDATE_COUNT_SQL = (
+    "UPDATE {tweet} SET {like_count} = {like_count} + %s, {updated_at} = %s WHERE {id} = %s RETURNING {like_count}"
+)
+SELECT_COUNT_SQL = "SELECT {like_count} FROM {tweet} WHERE {id} = %s"
+
+
+def _sql(template):
+    columns = ["id", "tweet_id", "user_id", "created_at", "like_count", "updated_at"]
+    return template.format(
+        like=connection.ops.quote_name(Like._meta.db_table),
+        tweet=connection.ops.quote_name(Tweet._meta.db_table),
+        **{column: connection.ops.quote_name(column) for column in columns},
+    )
+
+
+def version_key(user_pk):
+    return f"likes:version:{user_pk}"
+
+
+def touch_version(user_pk):
+    """Marks the user's likes as changed once the current transaction commits, for timeline ETags."""
+    transaction.on_commit(lambda: cache.set(version_key(user_pk), time.time_ns(), None))
+
+
+def _like_count(cursor, tweet_pk, delta, now):
+    if delta:
+        cursor.execute(_sql(UPDATE_COUNT_SQL), [delta, now, tweet_pk])
+    else:
+        cursor.execute(_sql(SELECT_COUNT_SQL), [tweet_pk])
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def like(tweet_pk, user):
+    """Returns the new like count, or None when the tweet does not exist."""
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(_sql(LIKE_SQL), [tweet_pk, user.pk, now, tweet_pk])
+        liked = cursor.rowcount
+        like_count = _like_count(cursor, tweet_pk, liked, now)
+        trending.record({tweet_pk: liked})
+    if liked:
+        touch_version(user.pk)
+    return like_count
+
+
+def unlike(tweet_pk, user):
+    """Returns the new like count, or None when the tweet does not exist."""
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(_sql(UNLIKE_SQL), [tweet_pk, user.pk])
+        unliked = cursor.rowcount
+        like_count = _like_count(cursor, tweet_pk, -unliked, now)
+        trending.record({tweet_pk: -unliked})
+    if unliked:
+        touch_version(user.pk)
+    return like_count
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from mysite.asgi import application
+from tweets.models import Tweet
+
+from .benchmark_views import git_commit, percentiles_ms
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive mysite.asgi in-process with concurrent clients, once with the sync and once with the async "
+        "like and follow views, and print requests/sec, latency, peak memory and threads as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=10, help="Simultaneous clients, one user each.")
+        parser.add_argument("--requests", type=int, default=50, help="Requests per client and scenario.")
+        parser.add_argument("--label", help="Free-form label stored in the report.")
+        parser.add_argument("--output", help="Write the report to this file instead of stdout.")
+
+    def get_clients(self, concurrency):
+        tweet = Tweet.objects.order_by("-like_count").first()
+        # The most followed user that still has enough non-followers to follow and unfollow them.
+        target = (
+            User.objects.filter(followers_count__lt=User.objects.count() - concurrency)
+            .order_by("-followers_count")
+            .first()
+        )
+        if tweet is None or target is None:
+            raise CommandError("The database needs at least one user and one tweet. Run seed_data first.")
+        # Each like/unlike and follow/unfollow pair leaves the dataset as it was found.
+        users = list(
+            User.objects.exclude(pk=target.pk)
+            .exclude(followers__following=target)
+            .exclude(like__tweet=tweet)[:concurrency]
+        )
+        if len(users) < concurrency:
+            raise CommandError(
+                f"The database needs {concurrency} users who neither follow {target} nor liked the tweet."
+            )
+
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            csrf_token = get_random_string(32)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}; "
+            cookie += f"{settings.CSRF_COOKIE_NAME}={csrf_token}"
+            clients.append([(b"cookie", cookie.encode()), (b"x-csrftoken", csrf_token.encode())])
+        scenarios = {
+            "like": [reverse("tweets:like", args=[tweet.pk]), reverse("tweets:unlike", args=[tweet.pk])],
+            "follow": [
+                reverse("accounts:follow", args=[target.username]),
+                reverse("accounts:unfollow", args=[target.username]),
+            ],
+        }
+        return clients, scenarios
+
+    async def request(self, application, path, headers, stats):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "POST",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"testserver"), *headers],
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+        }
+        body_sent = False
+        disconnect = asyncio.Event()
+
+        async def receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        status = None
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            stats["threads"] = max(stats["threads"], threading.active_count())
+
+        start = time.perf_counter()
+        await application(scope, receive, send)
+        disconnect.set()
+        if status >= 400:
+            raise CommandError(f"POST {path} returned {status}.")
+        return time.perf_counter() - start
+
+    async def run_scenario(self, application, clients, paths, requests, stats):
+        async def client(headers):
+            latencies = []
+            for _ in range(requests):
+                for path in paths:
+                    latencies.append(await self.request(application, path, headers, stats))
+            return latencies
+
+        results = await asyncio.gather(*(client(headers) for headers in clients))
+        return [latency for latencies in results for latency in latencies]
+
+    def measure(self, clients, scenarios, requests):
+        report = {}
+        for name, paths in scenarios.items():
+            stats = {"threads": threading.active_count()}
+            asyncio.run(self.run_scenario(application, clients, paths, 1, stats))
+
+            start = time.perf_counter()
+            latencies = asyncio.run(self.run_scenario(application, clients, paths, requests, stats))
+            elapsed = time.perf_counter() - start
+
+            tracemalloc.start()
+            asyncio.run(self.run_scenario(application, clients, paths, 1, stats))
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            report[name] = {
+                "requests_per_sec": round(len(latencies) / elapsed, 1),
+                **percentiles_ms(latencies),
+                "peak_memory_kb": round(peak_memory / 1024, 1),
+                "max_threads": stats["threads"],
+            }
+        return report
+
+    def handle(self, *args, **options):
+        clients, scenarios = self.get_clients(options["concurrency"])
+        report = {
+            "label": options["label"],
+            "commit": git_commit(),
+            "concurrency": options["concurrency"],
+            "requests": options["requests"],
+        }
+        # As in mysite.asgi: each request has a thread of its own, whose connection cannot be reused.
+        database = connections[DEFAULT_DB_ALIAS].settings_dict
+        conn_max_age, database["CONN_MAX_AGE"] = database["CONN_MAX_AGE"], 0
+        try:
+            for mode, async_views in [("sync", False), ("async", True)]:
+                with override_settings(ASYNC_VIEWS=async_views, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                    report[mode] = self.measure(clients, scenarios, options["requests"])
+        finally:
+            database["CONN_MAX_AGE"] = conn_max_age
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,175 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import Exists, F, OuterRef
+
+from tweets.models import Inbox, Like, Tweet
+
+from .benchmark_views import git_commit, percentiles_ms
+
+User = get_user_model()
+
+ALIAS = "benchmark"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a mixed read/write workload from several threads against the default SQLite database, once "
+        "with the stock backend and settings and once with the configured ones, and print throughput as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Simultaneous workers, one user each.")
+        parser.add_argument("--operations", type=int, default=200, help="Operations per worker and profile.")
+        parser.add_argument("--write-ratio", type=float, default=0.2, help="Share of operations that write.")
+        parser.add_argument("--random-seed", type=int, default=0)
+        parser.add_argument("--label", help="Free-form label stored in the report.")
+        parser.add_argument("--output", help="Write the report to this file instead of stdout.")
+
+    def get_profiles(self):
+        configured = connections[DEFAULT_DB_ALIAS].settings_dict
+        if configured["ENGINE"] != "mysite.sqlite3":
+            raise CommandError("The default database does not use the mysite.sqlite3 backend.")
+        # journal_mode is stored in the database file, so the baseline sets SQLite's default back.
+        baseline = {
+            **configured,
+            "ENGINE": "django.db.backends.sqlite3",
+            "CONN_MAX_AGE": 0,
+            "CONN_HEALTH_CHECKS": False,
+            "OPTIONS": {},
+        }
+        return {"before": (baseline, "delete"), "after": (configured, None)}
+
+    def get_workers(self, threads):
+        tweet = Tweet.objects.order_by("like_count", "pk").first()
+        if tweet is None:
+            raise CommandError("The database needs at least one tweet. Run seed_data first.")
+        # Each like is undone by an unlike, so the dataset is left as it was found.
+        user_pks = list(User.objects.exclude(like__tweet=tweet).values_list("pk", flat=True)[:threads])
+        if len(user_pks) < threads:
+            raise CommandError(f"The database needs {threads} users who have not liked the tweet.")
+        return tweet.pk, user_pks
+
+    def read(self, user_pk):
+        # The home page: one inbox page, its tweets and the viewer's likes.
+        tweet_pks = list(
+            Inbox.objects.using(ALIAS)
+            .filter(owner_id=user_pk)
+            .order_by("-created_at", "-tweet_id")
+            .values_list("tweet_id", flat=True)[:20]
+        )
+        list(
+            Tweet.objects.using(ALIAS)
+            .filter(pk__in=tweet_pks)
+            .select_related("user")
+            .annotate(liked=Exists(Like.objects.filter(tweet=OuterRef("pk"), user_id=user_pk)))
+        )
+
+    def write(self, user_pk, tweet_pk, liked):
+        with transaction.atomic(using=ALIAS):
+            if liked:
+                Like.objects.using(ALIAS).filter(tweet_id=tweet_pk, user_id=user_pk).delete()
+            else:
+                Like.objects.using(ALIAS).create(tweet_id=tweet_pk, user_id=user_pk)
+            Tweet.objects.using(ALIAS).filter(pk=tweet_pk).update(like_count=F("like_count") + (-1 if liked else 1))
+
+    def work(self, user_pk, tweet_pk, operations, write_ratio, rng):
+        connection = connections[ALIAS]
+        results = {"read": [], "write": [], "errors": 0}
+        liked = False
+        try:
+            for _ in range(operations):
+                kind = "write" if rng.random() < write_ratio else "read"
+                start = time.perf_counter()
+                try:
+                    if kind == "write":
+                        self.write(user_pk, tweet_pk, liked)
+                        liked = not liked
+                    else:
+                        self.read(user_pk)
+                except OperationalError:
+                    results["errors"] += 1
+                else:
+                    results[kind].append(time.perf_counter() - start)
+                # What request_finished does after every request.
+                connection.close_if_unusable_or_obsolete()
+            if liked:
+                self.write(user_pk, tweet_pk, liked)
+        finally:
+            connection.close()
+        return results
+
+    def measure(self, settings_dict, journal_mode, tweet_pk, user_pks, options):
+        connections.close_all()
+        if journal_mode:
+            conn = sqlite3.connect(settings_dict["NAME"])
+            try:
+                conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+            finally:
+                conn.close()
+        connections.settings[ALIAS] = settings_dict
+        opened = []
+
+        def count_connection(sender, connection, **kwargs):
+            if connection.alias == ALIAS:
+                opened.append(threading.get_ident())
+
+        connection_created.connect(count_connection)
+        try:
+            with ThreadPoolExecutor(len(user_pks)) as executor:
+                start = time.perf_counter()
+                futures = [
+                    executor.submit(
+                        self.work,
+                        user_pk,
+                        tweet_pk,
+                        options["operations"],
+                        options["write_ratio"],
+                        random.Random(options["random_seed"] + i),
+                    )
+                    for i, user_pk in enumerate(user_pks)
+                ]
+                results = [future.result() for future in futures]
+                elapsed = time.perf_counter() - start
+        finally:
+            connection_created.disconnect(count_connection)
+            del connections.settings[ALIAS]
+
+        report = {"ops_per_sec": 0.0, "errors": sum(result["errors"] for result in results)}
+        for kind in ["read", "write"]:
+            latencies = [latency for result in results for latency in result[kind]]
+            report["ops_per_sec"] += len(latencies) / elapsed
+            report[f"{kind}s_per_sec"] = round(len(latencies) / elapsed, 1)
+            if latencies:
+                report.update({f"{kind}_{key}": value for key, value in percentiles_ms(latencies, (50, 99)).items()})
+        report["ops_per_sec"] = round(report["ops_per_sec"], 1)
+        report["connections_opened"] = len(opened)
+        return report
+
+    def handle(self, *args, **options):
+        profiles = self.get_profiles()
+        tweet_pk, user_pks = self.get_workers(options["threads"])
+        report = {
+            "label": options["label"],
+            "commit": git_commit(),
+            "threads": options["threads"],
+            "operations": options["operations"],
+            "write_ratio": options["write_ratio"],
+        }
+        for name, (settings_dict, journal_mode) in profiles.items():
+            report[name] = self.measure(settings_dict, journal_mode, tweet_pk, user_pks, options)
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
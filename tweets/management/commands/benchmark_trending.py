@@ -0,0 +1,76 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from tweets import trending
+from tweets.models import Like, LikeBucket, Tweet
+
+from .benchmark_views import git_commit, time_calls
+
+# The score of trending.scores() computed from the Like table: every like of the window counts
+# 0.5 ** (age / TRENDING_HALF_LIFE_MINUTES), its age in whole minutes. POWER is one of the math
+# functions Django registers on SQLite connections.
+NAIVE_SQL = (
+    "SELECT {tweet_id}, SUM(POWER(0.5, ROUND((julianday(%s) - julianday(strftime('%%Y-%%m-%%d %%H:%%M:00', "
+    "{created_at}))) * 1440) / %s)) AS score FROM {like} WHERE {created_at} >= %s "
+    "GROUP BY {tweet_id} ORDER BY score DESC, {tweet_id} DESC LIMIT %s"
+)
+
+
+def naive_trending(now):
+    """What the trending page would run without buckets: every like in the window, scored and ranked."""
+    minute = trending.minute_of(now)
+    start = minute - timedelta(minutes=settings.TRENDING_WINDOW_MINUTES - 1)
+    quote = connection.ops.quote_name
+    sql = NAIVE_SQL.format(
+        like=quote(Like._meta.db_table), **{column: quote(column) for column in ["tweet_id", "created_at"]}
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql,
+            [
+                connection.ops.adapt_datetimefield_value(minute),
+                settings.TRENDING_HALF_LIFE_MINUTES,
+                connection.ops.adapt_datetimefield_value(start),
+                settings.TRENDING_SIZE,
+            ],
+        )
+        tweet_pks = [tweet_pk for tweet_pk, _ in cursor.fetchall()]
+    tweets = Tweet.objects.select_related("user").in_bulk(tweet_pks)
+    return [tweets[pk] for pk in tweet_pks]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the trending tweets read from the precomputed leaderboard with the same decayed "
+        "ranking computed from the Like table, and print their latency as JSON. Nothing is written: "
+        "run rollup_trending first for an up-to-date leaderboard."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Timed reads per strategy.")
+        parser.add_argument("--label", help="Free-form label stored in the report.")
+        parser.add_argument("--output", help="Write the report to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        report = {
+            "label": options["label"],
+            "commit": git_commit(),
+            "likes": Like.objects.count(),
+            "buckets": LikeBucket.objects.count(),
+            "naive": time_calls(lambda: naive_trending(now), options["requests"], (50, 95)),
+            "scores": time_calls(lambda: trending.scores(now), options["requests"], (50, 95)),
+            "leaderboard": time_calls(trending.leaderboard, options["requests"], (50, 95)),
+        }
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
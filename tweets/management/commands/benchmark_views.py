@@ -0,0 +1,195 @@
+import json
+import statistics
+import subprocess
+import time
+import tracemalloc
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from tweets.models import Inbox, Tweet
+from tweets.pagination import encode_cursor
+
+User = get_user_model()
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=settings.BASE_DIR)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def percentiles_ms(latencies, points=(50, 95, 99)):
+    """Returns {"p50_ms": ...} for latencies in seconds. A single latency stands for every percentile."""
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {f"p{point}_ms": round(percentiles[point - 1] * 1000, 3) for point in points}
+
+
+def time_calls(call, requests, points=(50, 95, 99)):
+    """Calls ``call`` once to warm up, then ``requests`` times, and returns the percentiles of the timed calls."""
+    call()
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return percentiles_ms(latencies, points)
+
+
+def step_key(step):
+    name, method, url, data = step
+    return f"{method.upper()} {name}"
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = "Measure p50/p95/p99 latency, query count and peak memory of every view and print them as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--username", help="Viewer. Defaults to the user who follows the most accounts.")
+        parser.add_argument("--requests", type=int, default=50, help="Timed requests per view.")
+        parser.add_argument("--views", nargs="*", help="Only benchmark these URL names, e.g. tweets:home.")
+        parser.add_argument("--label", help="Free-form label stored in the report.")
+        parser.add_argument("--output", help="Write the report to this file instead of stdout.")
+
+    def get_scenarios(self, viewer):
+        """
+        Each scenario is a list of (name, method, url, data) steps run in order on every
+        iteration. Writes are paired with the request that undoes them so that the dataset
+        is left as it was found. ``url`` may be a callable, evaluated outside the timing.
+        """
+        target = User.objects.exclude(pk=viewer.pk).order_by("-followers_count").first()
+        stranger = User.objects.exclude(pk=viewer.pk).exclude(followings__follower=viewer).first()
+        tweet = Tweet.objects.order_by("-like_count").first()
+        own_tweet = Tweet.objects.filter(user=viewer).order_by("-created_at").first()
+        if target is None or tweet is None:
+            raise CommandError("The database needs at least two users and one tweet. Run seed_data first.")
+        page_ids = list(
+            Inbox.objects.filter(owner=viewer)
+            .order_by("-created_at", "-tweet_id")
+            .values_list("tweet_id", flat=True)[: settings.TIMELINE_PAGE_SIZE]
+        ) or [tweet.pk]
+        last_entry = (
+            Inbox.objects.filter(owner=viewer)
+            .order_by("-created_at", "-tweet_id")[settings.TIMELINE_PAGE_SIZE - 1 : settings.TIMELINE_PAGE_SIZE]
+            .first()
+        )
+
+        def latest_own_tweet():
+            return reverse("tweets:delete", kwargs={"pk": Tweet.objects.filter(user=viewer).latest("created_at").pk})
+
+        scenarios = [
+            [("tweets:home", "get", reverse("tweets:home"), None)],
+            [("tweets:create", "get", reverse("tweets:create"), None)],
+            [("tweets:detail", "get", reverse("tweets:detail", kwargs={"pk": tweet.pk}), None)],
+            [("tweets:like_state", "get", reverse("tweets:like_state"), {"ids": ",".join(map(str, page_ids))})],
+            [
+                ("tweets:like", "post", reverse("tweets:like", kwargs={"pk": tweet.pk}), None),
+                ("tweets:unlike", "post", reverse("tweets:unlike", kwargs={"pk": tweet.pk}), None),
+            ],
+            [
+                ("tweets:create", "post", reverse("tweets:create"), {"content": "benchmark"}),
+                ("tweets:delete", "post", latest_own_tweet, None),
+            ],
+            [("accounts:signup", "get", reverse("accounts:signup"), None)],
+            [("accounts:login", "get", reverse("accounts:login"), None)],
+            [("accounts:user_profile", "get", reverse("accounts:user_profile", args=[target.username]), None)],
+            [("accounts:following_list", "get", reverse("accounts:following_list", args=[target.username]), None)],
+            [("accounts:follower_list", "get", reverse("accounts:follower_list", args=[target.username]), None)],
+        ]
+        if last_entry:
+            cursor = encode_cursor(last_entry.created_at, last_entry.tweet_id)
+            scenarios.append([("tweets:home page=2", "get", f"{reverse('tweets:home')}?cursor={cursor}", None)])
+        if own_tweet:
+            scenarios.append([("tweets:delete", "get", reverse("tweets:delete", kwargs={"pk": own_tweet.pk}), None)])
+        if stranger:
+            scenarios.append(
+                [
+                    ("accounts:follow", "post", reverse("accounts:follow", args=[stranger.username]), None),
+                    ("accounts:unfollow", "post", reverse("accounts:unfollow", args=[stranger.username]), None),
+                ]
+            )
+        return scenarios
+
+    def run_step(self, client, step):
+        name, method, url, data = step
+        url = url() if callable(url) else url
+        start = time.perf_counter()
+        response = getattr(client, method)(url, data)
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise CommandError(f"{method.upper()} {url} returned {response.status_code}.")
+        return elapsed
+
+    def handle(self, *args, **options):
+        if options["username"]:
+            viewer = User.objects.filter(username=options["username"]).first()
+        else:
+            viewer = User.objects.order_by("-followings_count").first()
+        if viewer is None:
+            raise CommandError("No viewer found. Run seed_data first.")
+
+        client = Client()
+        client.force_login(viewer)
+        latencies = defaultdict(list)
+        queries = {}
+        peak_memory = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            scenarios = self.get_scenarios(viewer)
+            if options["views"]:
+                scenarios = [s for s in scenarios if any(step[0].split()[0] in options["views"] for step in s)]
+
+            for scenario in scenarios:
+                for step in scenario:
+                    # Warm-up request, also used to count the queries of the step.
+                    counter = QueryCounter()
+                    with connection.execute_wrapper(counter):
+                        self.run_step(client, step)
+                    queries[step_key(step)] = counter.count
+
+                for _ in range(options["requests"]):
+                    for step in scenario:
+                        latencies[step_key(step)].append(self.run_step(client, step))
+
+                tracemalloc.start()
+                for step in scenario:
+                    tracemalloc.reset_peak()
+                    self.run_step(client, step)
+                    peak_memory[step_key(step)] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+        report = {
+            "label": options["label"],
+            "commit": git_commit(),
+            "viewer": viewer.username,
+            "requests": options["requests"],
+            "views": {},
+        }
+        for key, samples in sorted(latencies.items()):
+            report["views"][key] = {
+                **percentiles_ms(samples),
+                "queries": queries[key],
+                "peak_memory_kb": round(peak_memory[key] / 1024, 1),
+            }
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
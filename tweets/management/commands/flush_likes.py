@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tweets import like_buffer
+
+
+class Command(BaseCommand):
+    help = "Apply the likes and unlikes buffered while LIKE_WRITE_BEHIND is enabled."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--interval", type=float, help="Keep running and flush every this many seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            applied = like_buffer.flush(options["batch_size"])
+            self.stdout.write(self.style.SUCCESS(f"Applied {applied} like intent(s)."))
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,304 @@
+import json
+import sys
+from contextlib import ExitStack
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import FriendShip
+from tweets.models import Like, Tweet
+
+User = get_user_model()
+
+# One JSON object per line, users before the records that refer to them:
+#   {"type": "user", "username": "alice", "email": "a@example.com", "password": "<Django hash>"}
+#   {"type": "tweet", "id": 1, "username": "alice", "content": "hello", "created_at": "2024-01-01T00:00:00Z"}
+#   {"type": "follow", "follower": "bob", "following": "alice"}
+#   {"type": "like", "username": "bob", "tweet_id": 1}
+# created_at (date_joined for users) is optional everywhere. A tweet keeps its id, so that
+# likes can refer to it, unless a different tweet already has that id.
+REQUIRED = {
+    "user": {"username": str},
+    "tweet": {"id": int, "username": str, "content": str},
+    "follow": {"follower": str, "following": str},
+    "like": {"username": str, "tweet_id": int},
+}
+
+
+# The ORM cannot tell how many rows an insert with ignore_conflicts=True wrote, and would
+# replace created_at with the current time, so rows are inserted with plain SQL.
+INSERT_SQL = "INSERT INTO {table} ({columns}) VALUES {rows} ON CONFLICT DO NOTHING"
+
+
+class InvalidRecord(ValueError):
+    pass
+
+
+def read_records(lines):
+    for lineno, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield lineno, json.loads(line)
+            except ValueError:
+                yield lineno, None
+
+
+def parse_timestamp(value):
+    if value is None:
+        return timezone.now()
+    timestamp = parse_datetime(value) if isinstance(value, str) else None
+    if timestamp is None:
+        raise InvalidRecord(f"invalid timestamp {value!r}")
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+def validate(record):
+    """Returns the record's type and its fields normalised, or raises InvalidRecord."""
+    if not isinstance(record, dict) or record.get("type") not in REQUIRED:
+        raise InvalidRecord("not a user, tweet, follow or like object")
+    kind = record["type"]
+    for field, field_type in REQUIRED[kind].items():
+        value = record.get(field)
+        if not isinstance(value, field_type) or isinstance(value, bool) or value in ("", 0):
+            raise InvalidRecord(f"{field} has to be a non-empty {field_type.__name__}")
+
+    if kind == "user":
+        if len(record["username"]) > User._meta.get_field("username").max_length:
+            raise InvalidRecord("username is too long")
+        password = record.get("password")
+        if password is not None:
+            try:
+                identify_hasher(password)
+            except ValueError:
+                raise InvalidRecord("password has to be a Django password hash")
+        return kind, {
+            "username": record["username"],
+            "email": record.get("email", ""),
+            "password": password,
+            "date_joined": parse_timestamp(record.get("date_joined")),
+        }
+    if kind == "tweet" and len(record["content"]) > Tweet._meta.get_field("content").max_length:
+        raise InvalidRecord("content is too long")
+    if kind == "follow" and record["follower"] == record["following"]:
+        raise InvalidRecord("a user cannot follow themselves")
+    return kind, {**record, "created_at": parse_timestamp(record.get("created_at"))}
+
+
+def insert(model, objs, batch_size):
+    """Inserts the model instances that do not conflict with existing rows and returns how many it inserted."""
+    if not objs:
+        return 0
+    # Tweets keep the id they were imported with; other rows get one from the database.
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key or objs[0].pk is not None]
+    rows = []
+    for obj in objs:
+        row = []
+        for field in fields:
+            value = getattr(obj, field.attname)
+            if value is None:
+                # auto_now fields, such as Tweet.updated_at.
+                value = field.pre_save(obj, add=True)
+            row.append(field.get_db_prep_save(value, connection))
+        rows.append(row)
+
+    quote = connection.ops.quote_name
+    placeholders = "({})".format(", ".join(["%s"] * len(fields)))
+    batch_size = min(batch_size, connection.ops.bulk_batch_size(fields, objs))
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            sql = INSERT_SQL.format(
+                table=quote(model._meta.db_table),
+                columns=", ".join(quote(field.column) for field in fields),
+                rows=", ".join([placeholders] * len(batch)),
+            )
+            cursor.execute(sql, [value for row in batch for value in row])
+            inserted += cursor.rowcount
+    return inserted
+
+
+class Importer:
+    """
+    Buffers validated records per model and inserts the ones that are not in the database yet,
+    so that an import that was interrupted can be run again. Usernames are resolved through
+    ``user_pks``, which is filled from every user written or referred to. ``counts`` are the
+    rows actually inserted.
+    """
+
+    # In dependency order, so that a tweet can refer to a user from the same batch.
+    models = {"user": User, "tweet": Tweet, "follow": FriendShip, "like": Like}
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.user_pks = {}
+        # Tweet ids of the input that belong to a different tweet in the database.
+        self.conflicting_tweet_pks = set()
+        self.buffers = {kind: [] for kind in self.models}
+        self.counts = {kind: 0 for kind in self.models}
+        self.skipped = 0
+        self.conflicts = 0
+
+    def add(self, kind, fields):
+        self.buffers[kind].append(fields)
+        if len(self.buffers[kind]) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for kind, model in self.models.items():
+            records, self.buffers[kind] = self.buffers[kind], []
+            if not records:
+                continue
+            objs = getattr(self, f"build_{kind}s")(records)
+            self.counts[kind] += insert(model, objs, self.batch_size)
+            if kind == "user":
+                self.resolve([record["username"] for record in records])
+
+    def resolve(self, usernames):
+        missing = list({username for username in usernames if username not in self.user_pks})
+        for start in range(0, len(missing), self.batch_size):
+            self.user_pks.update(
+                User.objects.filter(username__in=missing[start : start + self.batch_size]).values_list(
+                    "username", "pk"
+                )
+            )
+
+    def build_users(self, records):
+        users = []
+        for record in records:
+            user = User(username=record["username"], email=record["email"], date_joined=record["date_joined"])
+            if record["password"]:
+                user.password = record["password"]
+            else:
+                user.set_unusable_password()
+            users.append(user)
+        return users
+
+    def build_tweets(self, records):
+        self.resolve([record["username"] for record in records])
+        existing = {
+            pk: (user_pk, content)
+            for pk, user_pk, content in Tweet.objects.filter(pk__in=[record["id"] for record in records]).values_list(
+                "pk", "user_id", "content"
+            )
+        }
+        tweets = []
+        for record in records:
+            if record["username"] not in self.user_pks:
+                self.skipped += 1
+                continue
+            key = (self.user_pks[record["username"]], record["content"])
+            # The same tweet imported before, or repeated in this batch, is left as it is.
+            if existing.setdefault(record["id"], key) != key:
+                self.conflicting_tweet_pks.add(record["id"])
+                self.conflicts += 1
+                continue
+            tweets.append(
+                Tweet(pk=record["id"], user_id=key[0], content=record["content"], created_at=record["created_at"])
+            )
+        return tweets
+
+    def build_follows(self, records):
+        self.resolve([username for record in records for username in (record["follower"], record["following"])])
+        follows = [
+            FriendShip(
+                follower_id=self.user_pks[record["follower"]],
+                following_id=self.user_pks[record["following"]],
+                created_at=record["created_at"],
+            )
+            for record in records
+            if record["follower"] in self.user_pks and record["following"] in self.user_pks
+        ]
+        self.skipped += len(records) - len(follows)
+        return follows
+
+    def build_likes(self, records):
+        self.resolve([record["username"] for record in records])
+        tweet_pks = set(
+            Tweet.objects.filter(pk__in=[record["tweet_id"] for record in records]).values_list("pk", flat=True)
+        )
+        # A like of a tweet whose id is taken by another tweet would land on the wrong one.
+        tweet_pks -= self.conflicting_tweet_pks
+        likes = [
+            Like(
+                tweet_id=record["tweet_id"], user_id=self.user_pks[record["username"]], created_at=record["created_at"]
+            )
+            for record in records
+            if record["username"] in self.user_pks and record["tweet_id"] in tweet_pks
+        ]
+        self.skipped += len(records) - len(likes)
+        return likes
+
+
+class Command(BaseCommand):
+    help = (
+        "Import users, tweets, follows and likes from a JSONL file in batched bulk inserts, then bring "
+        "the counters, timelines and suggestions up to date."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSONL file to import, or - for standard input.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT.")
+        parser.add_argument("--transaction-size", type=int, default=50000, help="Lines per transaction.")
+        parser.add_argument(
+            "--skip-derived",
+            action="store_true",
+            help="Do not reconcile counters, rebuild timelines and suggestions after the import.",
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(options["batch_size"])
+        invalid = 0
+        with ExitStack() as stack:
+            if options["path"] == "-":
+                lines = sys.stdin
+            else:
+                try:
+                    lines = stack.enter_context(open(options["path"], encoding="utf-8"))
+                except OSError as e:
+                    raise CommandError(f"Cannot read {options['path']}: {e.strerror}.")
+            records = read_records(lines)
+
+            while chunk := list(islice(records, options["transaction_size"])):
+                with transaction.atomic():
+                    for lineno, record in chunk:
+                        try:
+                            importer.add(*validate(record))
+                        except InvalidRecord as e:
+                            invalid += 1
+                            self.stderr.write(f"Line {lineno}: {e}.")
+                    importer.flush()
+                # With DEBUG on, the connection would keep the SQL of thousands of bulk inserts.
+                reset_queries()
+                # The username map is the only state kept across transactions.
+                self.stdout.write(
+                    f"{chunk[-1][0]} lines: "
+                    + ", ".join(f"{count} {kind}(s)" for kind, count in importer.counts.items())
+                    + f", {len(importer.user_pks)} usernames mapped."
+                )
+
+        if not options["skip_derived"]:
+            for command, args in [
+                ("reconcile_follow_counts", []),
+                ("reconcile_like_counts", []),
+                ("rebuild_timelines", []),
+                ("build_suggestions", ["--full"]),
+            ]:
+                call_command(command, *args, stdout=self.stdout)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Imported "
+                + ", ".join(f"{count} {kind}(s)" for kind, count in importer.counts.items())
+                + f"; skipped {invalid} invalid, {importer.skipped} unresolved and {importer.conflicts} "
+                + "conflicting record(s)."
+            )
+        )
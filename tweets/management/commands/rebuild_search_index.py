@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tweets import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of tweet contents in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Tweets indexed per transaction.")
+
+    def handle(self, *args, **options):
+        indexed = search.rebuild(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} tweet(s)."))
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tweets import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild every user's home timeline inbox from the FriendShip graph."
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*", help="Only rebuild the inboxes of these users.")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("pk")
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+
+        count = 0
+        for user in users.iterator():
+            with transaction.atomic():
+                timeline.rebuild(user)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} timeline(s)."))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from tweets.models import Like, Tweet
+
+
+class Command(BaseCommand):
+    help = "Fix Tweet.like_count values that drifted from the number of Like rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        actual_count = Coalesce(
+            Subquery(
+                Like.objects.filter(tweet=OuterRef("pk"))
+                .order_by()
+                .values("tweet")
+                .annotate(count=Count("pk"))
+                .values("count")
+            ),
+            0,
+        )
+
+        last_pk = 0
+        fixed = 0
+        while True:
+            batch = list(
+                Tweet.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .annotate(actual_count=actual_count)
+                .values_list("pk", "like_count", "actual_count")[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            drifted = [pk for pk, like_count, actual in batch if like_count != actual]
+            if drifted:
+                fixed += Tweet.objects.filter(pk__in=drifted).update(
+                    like_count=actual_count, updated_at=timezone.now()
+                )
+
+        self.stdout.write(self.style.SUCCESS(f"Reconciled {fixed} tweet(s)."))
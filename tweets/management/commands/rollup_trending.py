@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from tweets import trending
+
+
+class Command(BaseCommand):
+    help = "Rank tweets by their decayed likes of the last TRENDING_WINDOW_MINUTES into the trending leaderboard."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--backfill",
+            action="store_true",
+            help="Rebuild the like buckets of the window from the Like table first, e.g. after an import.",
+        )
+
+    def handle(self, *args, **options):
+        if options["backfill"]:
+            buckets = trending.backfill()
+            self.stdout.write(f"Rebuilt {buckets} like bucket(s).")
+        count = trending.rollup()
+        self.stdout.write(self.style.SUCCESS(f"Ranked {count} trending tweet(s)."))
@@ -0,0 +1,103 @@
+import random
+from collections import Counter, defaultdict
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from accounts.models import FriendShip
+from tweets.models import Inbox, Like, Tweet
+
+User = get_user_model()
+
+
+def power_law_weights(size, alpha):
+    return list(accumulate(1 / rank**alpha for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic dataset with power-law follows and skewed likes for benchmarking."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--follows", type=int, default=20, help="Average number of followings per user.")
+        parser.add_argument("--tweets", type=int, default=10000)
+        parser.add_argument("--likes", type=int, default=50000)
+        parser.add_argument("--alpha", type=float, default=1.2, help="Exponent of the power-law distributions.")
+        parser.add_argument("--prefix", default="seeduser", help="Prefix of the generated usernames.")
+        parser.add_argument("--password", default="seedpassword", help="Password shared by the generated users.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--random-seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["random_seed"])
+        batch_size = options["batch_size"]
+        user_count = options["users"]
+        alpha = options["alpha"]
+
+        # Popularity ranks are shuffled so that the most followed users are not simply the first ones.
+        ranks = list(range(user_count))
+        rng.shuffle(ranks)
+        user_weights = power_law_weights(user_count, alpha)
+
+        followings = rng.choices(ranks, cum_weights=user_weights, k=user_count * options["follows"])
+        edges = {(rng.randrange(user_count), following) for following in followings}
+        edges = {(follower, following) for follower, following in edges if follower != following}
+        followers_of = defaultdict(list)
+        for follower, following in edges:
+            followers_of[following].append(follower)
+
+        authors = rng.choices(ranks, cum_weights=user_weights, k=options["tweets"])
+        # Newer tweets are liked more, with a long tail of older ones.
+        newest_first = range(len(authors) - 1, -1, -1)
+        tweet_weights = power_law_weights(len(authors), alpha)
+        liked_tweets = rng.choices(newest_first, cum_weights=tweet_weights, k=options["likes"]) if authors else []
+        likes = {(tweet, rng.randrange(user_count)) for tweet in liked_tweets}
+        like_counts = Counter(tweet for tweet, _ in likes)
+        followings_counts = Counter(follower for follower, _ in edges)
+
+        password = make_password(options["password"])
+        with transaction.atomic():
+            users = User.objects.bulk_create(
+                [
+                    User(
+                        username=f"{options['prefix']}{i}",
+                        email=f"{options['prefix']}{i}@example.com",
+                        password=password,
+                        followers_count=len(followers_of[i]),
+                        followings_count=followings_counts[i],
+                    )
+                    for i in range(user_count)
+                ],
+                batch_size=batch_size,
+            )
+            FriendShip.objects.bulk_create(
+                [FriendShip(follower=users[follower], following=users[following]) for follower, following in edges],
+                batch_size=batch_size,
+            )
+            tweets = Tweet.objects.bulk_create(
+                [
+                    Tweet(user=users[author], content=f"seed tweet {i}", like_count=like_counts[i])
+                    for i, author in enumerate(authors)
+                ],
+                batch_size=batch_size,
+            )
+            Like.objects.bulk_create(
+                [Like(tweet=tweets[tweet], user=users[user]) for tweet, user in likes],
+                batch_size=batch_size,
+            )
+            inbox = (
+                Inbox(owner=users[owner], tweet=tweet, created_at=tweet.created_at)
+                for tweet, author in zip(tweets, authors)
+                for owner in [author, *followers_of[author]]
+            )
+            while batch := list(islice(inbox, batch_size)):
+                Inbox.objects.bulk_create(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {len(users)} users, {len(edges)} follows, {len(tweets)} tweets and {len(likes)} likes."
+            )
+        )
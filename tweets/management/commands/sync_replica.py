@@ -0,0 +1,45 @@
+import sqlite3
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the replica files listed in DATABASE_REPLICAS."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", action="append", help="Replica alias. Defaults to DATABASE_REPLICAS.")
+        parser.add_argument("--interval", type=float, help="Keep running and copy every this many seconds.")
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS].settings_dict["NAME"]
+        aliases = options["database"] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError("No replica to copy to. Set DATABASE_REPLICAS or pass --database.")
+        targets = [connections[alias].settings_dict["NAME"] for alias in aliases]
+        if any(Path(target).resolve() == Path(source).resolve() for target in targets):
+            raise CommandError("A replica is the primary database file itself.")
+
+        while True:
+            for alias, target in zip(aliases, targets):
+                start = time.perf_counter()
+                self.copy(source, target)
+                elapsed = (time.perf_counter() - start) * 1000
+                self.stdout.write(self.style.SUCCESS(f"Copied the primary to {alias} in {elapsed:.0f} ms."))
+            if options["interval"] is None:
+                break
+            time.sleep(options["interval"])
+
+    def copy(self, source, target):
+        # The backup API copies a consistent snapshot while the primary is in use, and replaces
+        # the replica's pages in one transaction, so its readers see either copy but never half.
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(target, timeout=30)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.13 on 2026-10-18 00:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0002_like_like_like_unique"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="tweet",
+            index=models.Index(fields=["created_at", "id"], name="tweet_timeline_idx"),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.1.13 on 2026-10-18 00:46
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+import django.db.models.deletion
+
+
+def populate_inbox(apps, schema_editor):
+    # As timeline.rebuild(): the newest TIMELINE_INBOX_SIZE tweets of each user and their followings.
+    FriendShip = apps.get_model("accounts", "FriendShip")
+    Inbox = apps.get_model("tweets", "Inbox")
+    Tweet = apps.get_model("tweets", "Tweet")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    for owner_pk in list(User.objects.values_list("pk", flat=True)):
+        followings = FriendShip.objects.filter(follower_id=owner_pk).values("following_id")
+        tweets = (
+            Tweet.objects.filter(Q(user_id=owner_pk) | Q(user__in=followings))
+            .order_by("-created_at", "-id")
+            .values_list("id", "created_at")[: settings.TIMELINE_INBOX_SIZE]
+        )
+        Inbox.objects.bulk_create(
+            [Inbox(owner_id=owner_pk, tweet_id=tweet_id, created_at=created_at) for tweet_id, created_at in tweets],
+            batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tweets", "0003_tweet_timeline_idx"),
+        ("accounts", "0002_friendship_friendship_follow_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Inbox",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField()),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="inbox",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("tweet", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="tweets.tweet")),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="inbox",
+            index=models.Index(fields=["owner", "created_at", "tweet"], name="inbox_timeline_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="inbox",
+            constraint=models.UniqueConstraint(fields=("owner", "tweet"), name="inbox_unique"),
+        ),
+        migrations.RunPython(populate_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.13 on 2026-10-18 00:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_like_count(apps, schema_editor):
+    Like = apps.get_model("tweets", "Like")
+    Tweet = apps.get_model("tweets", "Tweet")
+    like_count = (
+        Like.objects.filter(tweet=OuterRef("pk")).order_by().values("tweet").annotate(count=Count("pk")).values("count")
+    )
+    Tweet.objects.update(like_count=Coalesce(Subquery(like_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0004_inbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tweet",
+            name="like_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(populate_like_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.1.13 on 2026-10-18 00:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("tweets", "0005_tweet_like_count"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="tweet",
+            name="tweet_timeline_idx",
+        ),
+        migrations.AlterField(
+            model_name="like",
+            name="tweet",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to="tweets.tweet"),
+        ),
+        migrations.AlterField(
+            model_name="tweet",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tweet",
+            index=models.Index(fields=["user", "created_at", "id"], name="tweet_user_timeline_idx"),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+# Words are split by the unicode61 tokenizer, with prefix indexes for prefix queries of two
+# and three characters.
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE tweets_tweet_fts USING fts5(content, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "INSERT INTO tweets_tweet_fts (rowid, content) SELECT id, content FROM tweets_tweet",
+    """
+    CREATE TRIGGER tweets_tweet_fts_insert AFTER INSERT ON tweets_tweet BEGIN
+        INSERT INTO tweets_tweet_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER tweets_tweet_fts_delete AFTER DELETE ON tweets_tweet BEGIN
+        DELETE FROM tweets_tweet_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER tweets_tweet_fts_update AFTER UPDATE OF content ON tweets_tweet BEGIN
+        UPDATE tweets_tweet_fts SET content = new.content WHERE rowid = old.id;
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER tweets_tweet_fts_update",
+    "DROP TRIGGER tweets_tweet_fts_delete",
+    "DROP TRIGGER tweets_tweet_fts_insert",
+    "DROP TABLE tweets_tweet_fts",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0007_tweet_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
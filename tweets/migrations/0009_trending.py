@@ -0,0 +1,42 @@
+# Generated by Django 4.1.13 on 2026-10-18 02:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0008_tweet_fts"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrendingTweet",
+            fields=[
+                ("rank", models.IntegerField(primary_key=True, serialize=False)),
+                ("score", models.FloatField()),
+                ("tweet", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="tweets.tweet")),
+            ],
+        ),
+        migrations.CreateModel(
+            name="LikeBucket",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("minute", models.DateTimeField()),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "tweet",
+                    models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to="tweets.tweet"),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="likebucket",
+            index=models.Index(fields=["minute"], name="like_bucket_minute_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="likebucket",
+            constraint=models.UniqueConstraint(fields=("tweet", "minute"), name="like_bucket_unique"),
+        ),
+    ]
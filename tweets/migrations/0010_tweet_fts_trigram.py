@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# Recreates tweets_tweet_fts with the trigram tokenizer, which unlike unicode61 can find words
+# in text that is not separated by spaces. The triggers are recreated with the table.
+TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER tweets_tweet_fts_insert AFTER INSERT ON tweets_tweet BEGIN
+        INSERT INTO tweets_tweet_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER tweets_tweet_fts_delete AFTER DELETE ON tweets_tweet BEGIN
+        DELETE FROM tweets_tweet_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER tweets_tweet_fts_update AFTER UPDATE OF content ON tweets_tweet BEGIN
+        UPDATE tweets_tweet_fts SET content = new.content WHERE rowid = old.id;
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER tweets_tweet_fts_update",
+    "DROP TRIGGER tweets_tweet_fts_delete",
+    "DROP TRIGGER tweets_tweet_fts_insert",
+    "DROP TABLE tweets_tweet_fts",
+]
+
+
+def create_sql(options):
+    return [
+        f"CREATE VIRTUAL TABLE tweets_tweet_fts USING fts5(content, {options})",
+        "INSERT INTO tweets_tweet_fts (rowid, content) SELECT id, content FROM tweets_tweet",
+        *TRIGGERS_SQL,
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tweets", "0009_trending"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            DROP_SQL + create_sql("tokenize='trigram'"),
+            DROP_SQL + create_sql("tokenize='unicode61 remove_diacritics 2', prefix='2 3'"),
+        ),
+    ]
@@ -5,13 +5,20 @@ User = get_user_model()
 
 
 class Tweet(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     content = models.TextField(max_length=140)
+    like_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at", "id"], name="tweet_user_timeline_idx"),
+        ]
 
 
 class Like(models.Model):
-    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE)
+    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE, db_index=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -19,3 +26,41 @@ class Like(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["tweet", "user"], name="like_unique"),
         ]
+
+
+class Inbox(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="inbox", db_index=False)
+    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "tweet"], name="inbox_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "created_at", "tweet"], name="inbox_timeline_idx"),
+        ]
+
+
+class LikeBucket(models.Model):
+    """Net likes of a tweet in one minute, written with every like and unlike for tweets.trending."""
+
+    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE, db_index=False)
+    minute = models.DateTimeField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["tweet", "minute"], name="like_bucket_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["minute"], name="like_bucket_minute_idx"),
+        ]
+
+
+class TrendingTweet(models.Model):
+    """The leaderboard written by rollup_trending, one row per rank."""
+
+    rank = models.IntegerField(primary_key=True)
+    tweet = models.ForeignKey(Tweet, on_delete=models.CASCADE)
+    score = models.FloatField()
@@ -0,0 +1,78 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from django.http import Http404
+
+
+def _encode(key, pk):
+    return base64.urlsafe_b64encode(f"{key}_{pk}".encode()).decode()
+
+
+def _decode(cursor, parse_key):
+    try:
+        key, pk = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("_", 1)
+        return parse_key(key), int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        raise Http404("無効なカーソルです。")
+
+
+def encode_cursor(created_at, pk):
+    return _encode(created_at.isoformat(), pk)
+
+
+def decode_cursor(cursor):
+    return _decode(cursor, datetime.fromisoformat)
+
+
+def encode_rank_cursor(rank, pk):
+    # repr() round-trips the float exactly, so the next page starts right after it.
+    return _encode(repr(rank), pk)
+
+
+def decode_rank_cursor(cursor):
+    return _decode(cursor, float)
+
+
+def keyset_page(queryset, cursor, page_size, cursor_fields=("created_at", "id")):
+    """
+    Returns the page of ``queryset`` after ``cursor``, newest first, and the cursor of the
+    next page or None.
+    """
+    created_field, pk_field = cursor_fields
+    queryset = queryset.order_by(f"-{created_field}", f"-{pk_field}")
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f"{created_field}__lte": created_at})
+            & (Q(**{f"{created_field}__lt": created_at}) | Q(**{f"{pk_field}__lt": pk}))
+        )
+
+    object_list = list(queryset[: page_size + 1])
+    next_cursor = None
+    if len(object_list) > page_size:
+        last = object_list[page_size - 1]
+        next_cursor = encode_cursor(getattr(last, created_field), getattr(last, pk_field))
+    return object_list[:page_size], next_cursor
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that pages on (created_at, id) instead of OFFSET, so that every page
+    costs one index range scan and the "next" cursor is not shifted by newly created rows.
+    """
+
+    cursor_kwarg = "cursor"
+    cursor_fields = ("created_at", "id")
+
+    def paginate_queryset(self, queryset, page_size):
+        object_list, self.next_cursor = keyset_page(
+            queryset, self.request.GET.get(self.cursor_kwarg), page_size, self.cursor_fields
+        )
+        return (None, None, object_list, self.next_cursor is not None)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["next_cursor"] = self.next_cursor
+        return context
@@ -0,0 +1,110 @@
+from django.db import connections, router, transaction
+
+from .models import Tweet
+from .pagination import decode_rank_cursor, encode_rank_cursor
+
+# tweets_tweet_fts is an FTS5 table with its own copy of Tweet.content, kept in sync by the
+# triggers of migration 0010. It is not external-content, so that rows can be deleted by
+# rowid without knowing what was indexed, which rebuild() relies on. The trigram tokenizer
+# indexes every three characters, so that words are found in text without spaces, such as
+# Japanese. Shorter words cannot be looked up in it and are refused rather than scanned for.
+FTS_TABLE = "tweets_tweet_fts"
+TRIGRAM_LENGTH = 3
+
+# rank is bm25(), lower is better. Ties are broken by rowid, so that the (rank, id) of the last
+# result is a cursor that neither repeats nor skips tweets of the same rank.
+MATCH_SQL = "SELECT rowid, rank FROM {fts} WHERE {fts} MATCH %s{after} ORDER BY rank, rowid LIMIT %s"
+AFTER_SQL = " AND (rank > %s OR (rank = %s AND rowid > %s))"
+MAX_ID_SQL = "SELECT MAX({id}) FROM {tweet}"
+BATCH_END_SQL = "SELECT {id} FROM {tweet} WHERE {id} > %s AND {id} <= %s ORDER BY {id} LIMIT 1 OFFSET %s"
+DELETE_SQL = "DELETE FROM {fts} WHERE rowid > %s AND rowid <= %s"
+INSERT_SQL = "INSERT INTO {fts} (rowid, content) SELECT {id}, {content} FROM {tweet} WHERE {id} > %s AND {id} <= %s"
+DELETE_ORPHANS_SQL = "DELETE FROM {fts} WHERE rowid > %s AND rowid NOT IN (SELECT {id} FROM {tweet} WHERE {id} > %s)"
+OPTIMIZE_SQL = "INSERT INTO {fts} ({fts}) VALUES ('optimize')"
+
+
+def _sql(connection, template, **kwargs):
+    return template.format(
+        fts=connection.ops.quote_name(FTS_TABLE),
+        tweet=connection.ops.quote_name(Tweet._meta.db_table),
+        id=connection.ops.quote_name("id"),
+        content=connection.ops.quote_name("content"),
+        **kwargs,
+    )
+
+
+def split_terms(text):
+    """
+    Returns the words of ``text`` as an FTS5 query, or "" if there are none, and the list of
+    words shorter than TRIGRAM_LENGTH, which the query leaves out. Every word has to appear
+    somewhere in a tweet; a trailing * is ignored and FTS5 operators and quotes are taken
+    literally.
+    """
+    phrases = []
+    short = []
+    for word in text.split():
+        word = word.rstrip("*")
+        if len(word) >= TRIGRAM_LENGTH:
+            phrases.append('"{}"'.format(word.replace('"', '""')))
+        elif word:
+            short.append(word)
+    return " ".join(phrases), short
+
+
+def search(text, cursor, page_size):
+    """
+    Returns a page of the tweets containing every word of ``text``, most relevant first, and
+    the cursor of the next page or None. Words shorter than TRIGRAM_LENGTH are ignored, so the
+    caller has to refuse them. Ranks shift a little as tweets are added, which can move a
+    tweet across the boundary of a page that was already read.
+    """
+    query, _ = split_terms(text)
+    if not query:
+        return [], None
+    connection = connections[router.db_for_read(Tweet)]
+    params = [query]
+    after = ""
+    if cursor:
+        rank, pk = decode_rank_cursor(cursor)
+        params += [rank, rank, pk]
+        after = AFTER_SQL
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(_sql(connection, MATCH_SQL, after=after), [*params, page_size + 1])
+        rows = db_cursor.fetchall()
+
+    tweets = Tweet.objects.using(connection.alias).select_related("user").in_bulk([pk for pk, _ in rows[:page_size]])
+    # A tweet deleted between the two queries is left out of the page.
+    object_list = [tweets[pk] for pk, _ in rows[:page_size] if pk in tweets]
+    next_cursor = None
+    if len(rows) > page_size:
+        pk, rank = rows[page_size - 1]
+        next_cursor = encode_rank_cursor(rank, pk)
+    return object_list, next_cursor
+
+
+def rebuild(batch_size, using="default"):
+    """
+    Reindexes every tweet in id ranges of ``batch_size``, one transaction each, and returns
+    how many were indexed. Tweets created meanwhile are past the last range and already
+    indexed by the triggers.
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(connection, MAX_ID_SQL))
+        max_id = cursor.fetchone()[0] or 0
+
+    indexed = 0
+    last = 0
+    while last < max_id:
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(_sql(connection, BATCH_END_SQL), [last, max_id, batch_size - 1])
+            row = cursor.fetchone()
+            end = row[0] if row else max_id
+            cursor.execute(_sql(connection, DELETE_SQL), [last, end])
+            cursor.execute(_sql(connection, INSERT_SQL), [last, end])
+            indexed += cursor.rowcount
+        last = end
+    with connection.cursor() as cursor:
+        cursor.execute(_sql(connection, DELETE_ORPHANS_SQL), [max_id, max_id])
+        cursor.execute(_sql(connection, OPTIMIZE_SQL))
+    return indexed
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import stream, timeline
+from .models import Tweet
+
+User = get_user_model()
+
+
+@receiver(pre_delete, sender=User)
+def release_likes(sender, instance, **kwargs):
+    Tweet.objects.filter(like__user=instance).update(like_count=F("like_count") - 1, updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Tweet)
+def publish_tweet(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: stream.broker.publish(instance))
+
+
+@receiver(post_delete, sender=Tweet)
+def touch_timelines(sender, instance, **kwargs):
+    timeline.touch(timeline.DELETED_VERSION_KEY)
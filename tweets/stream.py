@@ -0,0 +1,159 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from importlib import import_module
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db.models import Q
+from django.http import Http404, QueryDict, parse_cookie
+from django.urls import reverse
+
+from accounts.models import FriendShip
+
+from . import cards
+from .models import Inbox, Tweet
+from .pagination import decode_cursor, encode_cursor
+
+
+def format_event(tweet, html):
+    data = json.dumps({"tweet_pk": tweet.pk, "html": str(html)})
+    return f"event: tweet\nid: {encode_cursor(tweet.created_at, tweet.pk)}\ndata: {data}\n\n".encode()
+
+
+class Broker:
+    """
+    Hands new tweets to the open streams of the author's followers. Streams live on the event
+    loop while tweets are created in worker threads, so delivery goes through
+    call_soon_threadsafe. Only streams served by this process are reached.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def subscribe(self, author_pks, loop, queue):
+        with self.lock:
+            for author_pk in author_pks:
+                self.subscribers[author_pk].add((loop, queue))
+
+    def unsubscribe(self, author_pks, loop, queue):
+        with self.lock:
+            for author_pk in author_pks:
+                self.subscribers[author_pk].discard((loop, queue))
+                if not self.subscribers[author_pk]:
+                    del self.subscribers[author_pk]
+
+    def publish(self, tweet):
+        with self.lock:
+            subscribers = list(self.subscribers.get(tweet.user_id, ()))
+        if not subscribers:
+            return
+        event = ((tweet.created_at, tweet.pk), format_event(tweet, cards.render_cards([tweet])[0]))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+
+broker = Broker()
+
+
+def catch_up(user, cursor):
+    """Returns the (created_at, pk) keys and events of the tweets in the user's inbox after ``cursor``."""
+    created_at, pk = decode_cursor(cursor)
+    entries = list(
+        Inbox.objects.filter(owner=user)
+        .filter(Q(created_at__gt=created_at) | Q(created_at=created_at, tweet_id__gt=pk))
+        .order_by("created_at", "tweet_id")
+        .values_list("tweet_id", flat=True)[: settings.TIMELINE_PAGE_SIZE]
+    )
+    tweets = Tweet.objects.select_related("user").in_bulk(entries)
+    tweet_list = [tweets[pk] for pk in entries if pk in tweets]
+    return [
+        ((tweet.created_at, tweet.pk), format_event(tweet, html))
+        for tweet, html in zip(tweet_list, cards.render_cards(tweet_list))
+    ]
+
+
+def followed_pks(user):
+    return [user.pk, *FriendShip.objects.filter(follower=user).values_list("following_id", flat=True)]
+
+
+class TweetStreamApplication:
+    """
+    ASGI application that serves tweets:stream itself, as a long-lived server-sent events
+    response that costs one queue and no thread per idle connection, and passes every other
+    request to Django. Under WSGI the same URL is served by TweetStreamView instead.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != reverse("tweets:stream"):
+            return await self.application(scope, receive, send)
+
+        user = await sync_to_async(self.get_user)(scope)
+        if not user.is_authenticated:
+            return await self.respond(send, 403)
+        last_event_id = dict(scope["headers"]).get(b"last-event-id", b"").decode()
+        cursor = last_event_id or QueryDict(scope["query_string"]).get("cursor", "")
+        try:
+            decode_cursor(cursor)
+        except Http404:
+            return await self.respond(send, 400)
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        authors = await sync_to_async(followed_pks)(user)
+        broker.subscribe(authors, loop, queue)
+        try:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream"), (b"cache-control", b"no-cache")],
+                }
+            )
+            stream = asyncio.ensure_future(self.stream(send, queue, user, cursor))
+            disconnect = asyncio.ensure_future(self.wait_for_disconnect(receive))
+            done, pending = await asyncio.wait([stream, disconnect], return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+            for task in done:
+                task.result()
+        finally:
+            broker.unsubscribe(authors, loop, queue)
+
+    def get_user(self, scope):
+        cookies = parse_cookie(dict(scope["headers"]).get(b"cookie", b"").decode())
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        return get_user(SimpleNamespace(session=store(cookies.get(settings.SESSION_COOKIE_NAME))))
+
+    async def respond(self, send, status):
+        await send({"type": "http.response.start", "status": status, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    async def stream(self, send, queue, user, cursor):
+        # Subscribed before catching up, so tweets created meanwhile are in the queue and the
+        # ones already sent are skipped by their key.
+        last_key = decode_cursor(cursor)
+        while events := await sync_to_async(catch_up)(user, encode_cursor(*last_key)):
+            for key, event in events:
+                last_key = key
+                await send({"type": "http.response.body", "body": event, "more_body": True})
+        while True:
+            try:
+                key, event = await asyncio.wait_for(queue.get(), settings.TWEET_STREAM_HEARTBEAT)
+            except asyncio.TimeoutError:
+                await send({"type": "http.response.body", "body": b": heartbeat\n\n", "more_body": True})
+                continue
+            if key > last_key:
+                last_key = key
+                await send({"type": "http.response.body", "body": event, "more_body": True})
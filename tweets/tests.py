@@ -1,8 +1,35 @@
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from django.urls import reverse
+from django.contrib.auth.hashers import make_password
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from accounts.models import FriendShip
+from mysite.testing import QueryBudgetTestMixin, QueryPlanTestMixin
 
-from .models import Like, Tweet
+from . import cards, like_buffer, likes, search, stream, timeline, trending, views
+from .checks import check_shared_cache
+from .management.commands import benchmark_trending, sync_replica
+from .models import Inbox, Like, LikeBucket, TrendingTweet, Tweet
+from .pagination import encode_cursor
 
 User = get_user_model()
 
@@ -18,6 +45,8 @@ class TestHomeView(TestCase):
         self.client.login(username="testuser", password="testpassword")
         self.post1 = Tweet.objects.create(user=self.user, content="testpost1")
         self.post2 = Tweet.objects.create(user=self.user, content="testpost2")
+        timeline.fan_out(self.post1)
+        timeline.fan_out(self.post2)
 
     def test_success_get(self):
         response = self.client.get(self.url)
@@ -29,6 +58,253 @@ class TestHomeView(TestCase):
             ordered=False,
         )
 
+    @override_settings(TIMELINE_PAGE_SIZE=2)
+    def test_success_get_with_cursor(self):
+        post3 = Tweet.objects.create(user=self.user, content="testpost3")
+        timeline.fan_out(post3)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["tweet_list"], [post3, self.post2])
+        next_cursor = response.context["next_cursor"]
+        self.assertIsNotNone(next_cursor)
+
+        timeline.fan_out(Tweet.objects.create(user=self.user, content="testpost4"))
+        response = self.client.get(self.url, {"cursor": next_cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["tweet_list"], [self.post1])
+        self.assertIsNone(response.context["next_cursor"])
+
+    @override_settings(TIMELINE_PAGE_SIZE=1)
+    def test_success_get_with_cursor_on_same_created_at(self):
+        Inbox.objects.update(created_at=self.post1.created_at)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["tweet_list"], [self.post2])
+        response = self.client.get(self.url, {"cursor": response.context["next_cursor"]})
+        self.assertEqual(response.context["tweet_list"], [self.post1])
+
+    def test_failure_get_with_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_success_get_only_followed_users(self):
+        followed = User.objects.create_user(username="followed", email="followed@test.com", password="testpassword")
+        stranger = User.objects.create_user(username="stranger", email="stranger@test.com", password="testpassword")
+        FriendShip.objects.create(follower=self.user, following=followed)
+        followed_post = Tweet.objects.create(user=followed, content="followedpost")
+        stranger_post = Tweet.objects.create(user=stranger, content="strangerpost")
+        timeline.fan_out(followed_post)
+        timeline.fan_out(stranger_post)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["tweet_list"], [followed_post, self.post2, self.post1])
+
+
+@override_settings(TIMELINE_ETAGS=True)
+class TestTimelineView(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("tweets:timeline")
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.client.force_login(self.user1)
+        self.post1 = Tweet.objects.create(user=self.user1, content="testpost1")
+        self.post2 = Tweet.objects.create(user=self.user2, content="testpost2")
+        timeline.fan_out(self.post1)
+        Like.objects.create(user=self.user1, tweet=self.post1)
+
+    def get(self, etag=None, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            if etag is None:
+                return self.client.get(self.url, params)
+            return self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_success_get(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "tweets": [
+                    {
+                        "tweet_pk": self.post1.pk,
+                        "username": "testuser1",
+                        "content": "testpost1",
+                        "created_at": self.post1.created_at.isoformat()[:23] + "Z",
+                        "liked": True,
+                        "url": reverse("tweets:detail", args=[self.post1.pk]),
+                    }
+                ],
+                "next_cursor": None,
+            },
+        )
+        self.assertFalse(response["ETag"].startswith("W/"))
+
+    def test_success_get_not_modified(self):
+        etag = self.get()["ETag"]
+        # The session, its user and the newest inbox row.
+        with self.assertNumQueries(3):
+            response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    @override_settings(TIMELINE_ETAGS=False)
+    def test_success_get_without_etags(self):
+        self.assertFalse(self.get().has_header("ETag"))
+        self.assertEqual(self.get("*").status_code, 200)
+
+    @override_settings(TIMELINE_PAGE_SIZE=1)
+    def test_success_get_with_cursor(self):
+        post3 = Tweet.objects.create(user=self.user1, content="testpost3")
+        timeline.fan_out(post3)
+        response = self.get()
+        self.assertEqual([tweet["tweet_pk"] for tweet in response.json()["tweets"]], [post3.pk])
+        next_response = self.get(response["ETag"], cursor=response.json()["next_cursor"])
+        self.assertEqual(next_response.status_code, 200)
+        self.assertEqual([tweet["tweet_pk"] for tweet in next_response.json()["tweets"]], [self.post1.pk])
+
+    def test_success_get_modified(self):
+        changes = [
+            lambda: timeline.fan_out(Tweet.objects.create(user=self.user1, content="testpost3")),
+            lambda: self.client.post(reverse("accounts:follow", args=["testuser2"])),
+            lambda: self.client.post(reverse("tweets:like", args=[self.post2.pk])),
+            lambda: self.client.post(reverse("tweets:unlike", args=[self.post2.pk])),
+            lambda: self.client.post(reverse("accounts:unfollow", args=["testuser2"])),
+            lambda: Tweet.objects.filter(content="testpost3").delete(),
+        ]
+        etag = self.get()["ETag"]
+        for change in changes:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            response = self.get(etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+    def test_success_get_unchanged_by_other_users(self):
+        etag = self.get()["ETag"]
+        self.client.force_login(self.user2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("tweets:like", args=[self.post1.pk]))
+        self.client.force_login(self.user1)
+        self.assertEqual(self.get(etag).status_code, 304)
+
+    @override_settings(LIKE_WRITE_BEHIND=True)
+    def test_success_get_with_write_behind(self):
+        etag = self.get()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("tweets:unlike", args=[self.post1.pk]))
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()["tweets"][0]["liked"])
+
+    def test_failure_get_with_invalid_cursor(self):
+        response = self.get(cursor="invalid")
+        self.assertEqual(response.status_code, 404)
+
+
+class TestSearchView(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("tweets:search")
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.client.force_login(self.user)
+        self.post1 = Tweet.objects.create(user=self.user, content="hello world")
+        self.post2 = Tweet.objects.create(user=self.user, content="hello hello there")
+        self.post3 = Tweet.objects.create(user=self.user, content="goodbye world")
+        self.post4 = Tweet.objects.create(user=self.user, content="helicopter")
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [int(pk) for pk in re.findall(r'data-tweet-pk="(\d+)"', response.content.decode())]
+
+    def test_success_get(self):
+        self.assertEqual(self.search("hello"), [self.post2.pk, self.post1.pk])
+        self.assertEqual(self.search("WORLD hello"), [self.post1.pk])
+        self.assertEqual(self.search(""), [])
+        self.assertEqual(self.search("nothing"), [])
+
+    def test_success_get_with_part_of_word(self):
+        # "hello hello there" has "hel" twice.
+        self.assertEqual(self.search("hel"), [self.post2.pk, self.post4.pk, self.post1.pk])
+        self.assertEqual(self.search("hel*"), [self.post2.pk, self.post4.pk, self.post1.pk])
+        self.assertEqual(self.search("llo orl"), [self.post1.pk])
+
+    def test_success_get_ranked_by_relevance(self):
+        post = Tweet.objects.create(user=self.user, content="world world world")
+        self.assertEqual(self.search("world"), [post.pk, self.post1.pk, self.post3.pk])
+
+    def test_success_get_japanese(self):
+        post = Tweet.objects.create(user=self.user, content="今日は東京に行った")
+        Tweet.objects.create(user=self.user, content="京都に行った")
+        self.assertEqual(self.search("東京に"), [post.pk])
+        self.assertEqual(self.search("今日は 東京に"), [post.pk])
+        self.assertEqual(self.search("大阪に"), [])
+
+    def test_failure_get_with_short_word(self):
+        for query in ["東京", "he orl", "hello a"]:
+            with self.subTest(query=query):
+                response = self.client.get(self.url, {"q": query})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(
+                    "3文字以上の語で検索してください。",
+                    [message.message for message in get_messages(response.wsgi_request)],
+                )
+
+    def test_success_get_with_operators_as_words(self):
+        self.assertEqual(self.search("hello AND goodbye"), [])
+        for query in ['"""', "NEAR(hello", "hello -world", "*", "content:hello"]:
+            self.search(query)
+
+    @override_settings(SEARCH_PAGE_SIZE=1)
+    def test_success_get_with_cursor(self):
+        response = self.client.get(self.url, {"q": "hello"})
+        self.assertEqual(self.search("hello"), [self.post2.pk])
+        next_cursor = response.context["next_cursor"]
+        self.assertEqual(self.search("hello", cursor=next_cursor), [self.post1.pk])
+        response = self.client.get(self.url, {"q": "hello", "cursor": next_cursor})
+        self.assertIsNone(response.context["next_cursor"])
+
+    @override_settings(SEARCH_PAGE_SIZE=2)
+    def test_success_get_with_cursor_through_ties(self):
+        posts = Tweet.objects.bulk_create([Tweet(user=self.user, content="same rank") for _ in range(5)])
+        params = {"q": "same"}
+        found = []
+        while True:
+            response = self.client.get(self.url, params)
+            found += [int(pk) for pk in re.findall(r'data-tweet-pk="(\d+)"', response.content.decode())]
+            if response.context["next_cursor"] is None:
+                break
+            params["cursor"] = response.context["next_cursor"]
+        self.assertEqual(found, [post.pk for post in posts])
+
+    def test_failure_get_with_invalid_cursor(self):
+        response = self.client.get(self.url, {"q": "hello", "cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_success_index_follows_changes(self):
+        self.post1.delete()
+        self.post3.content = "hello again"
+        self.post3.save()
+        Tweet.objects.bulk_create([Tweet(user=self.user, content="bulk hello")])
+        self.assertEqual(len(self.search("hello")), 3)
+        self.assertEqual(self.search("goodbye"), [])
+
+    def test_success_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {search.FTS_TABLE}")
+            stale = [(self.post3.pk, "hello stale"), (1000, "hello orphan")]
+            cursor.executemany(f"INSERT INTO {search.FTS_TABLE} (rowid, content) VALUES (%s, %s)", stale)
+        self.assertEqual(self.search("hello"), [self.post3.pk])
+
+        stdout = StringIO()
+        call_command("rebuild_search_index", batch_size=3, stdout=stdout)
+        self.assertIn("Indexed 4 tweet(s).", stdout.getvalue())
+        self.assertEqual(self.search("hello"), [self.post2.pk, self.post1.pk])
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid FROM {search.FTS_TABLE} ORDER BY rowid")
+            rowids = [row[0] for row in cursor.fetchall()]
+        self.assertEqual(rowids, [self.post1.pk, self.post2.pk, self.post3.pk, self.post4.pk])
+
 
 class TestTweetCreateView(TestCase):
     def setUp(self):
@@ -55,6 +331,14 @@ class TestTweetCreateView(TestCase):
         )
         self.assertTrue(Tweet.objects.filter(content="testpost", user=self.user).exists())
 
+    def test_success_post_fans_out_to_followers(self):
+        follower = User.objects.create_user(username="follower", email="follower@test.com", password="testpassword")
+        FriendShip.objects.create(follower=follower, following=self.user)
+        self.client.post(self.url, data={"content": "testpost"})
+        tweet = Tweet.objects.get(content="testpost")
+        self.assertTrue(Inbox.objects.filter(owner=self.user, tweet=tweet).exists())
+        self.assertTrue(Inbox.objects.filter(owner=follower, tweet=tweet).exists())
+
     def test_failure_post_with_empty_content(self):
         empty_content_post = {"content": ""}
         response = self.client.post(self.url, empty_content_post)
@@ -94,6 +378,30 @@ class TestTweetDetailView(TestCase):
             self.post,
         )
 
+    def test_success_get_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        # The session, its user and Tweet.updated_at.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        likes.like(self.post.pk, self.user)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_success_get_modified_for_other_user(self):
+        etag = self.client.get(self.url)["ETag"]
+        User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.client.login(username="testuser2", password="testpassword2")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "削除")
+
+    def test_failure_get_with_not_exist_tweet(self):
+        response = self.client.get(reverse("tweets:detail", kwargs={"pk": 100}), HTTP_IF_NONE_MATCH="*")
+        self.assertEqual(response.status_code, 404)
+
 
 class TestTweetDeleteView(TestCase):
     def setUp(self):
@@ -150,6 +458,9 @@ class TestLikeView(TestCase):
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 200)
         self.assertTrue(Like.objects.filter(tweet=self.post, user=self.user1).exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(response.json()["like_num"], 1)
 
     def test_failure_post_with_not_exist_tweet(self):
         url = reverse("tweets:like", kwargs={"pk": "100"})
@@ -159,9 +470,11 @@ class TestLikeView(TestCase):
 
     def test_failure_post_with_liked_tweet(self):
         Like.objects.create(tweet=self.post, user=self.user1)
+        Tweet.objects.filter(pk=self.post.pk).update(like_count=1)
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(Like.objects.all().count(), 1)
+        self.assertEqual(response.json()["like_num"], 1)
 
 
 class TestUnlikeView(TestCase):
@@ -174,12 +487,16 @@ class TestUnlikeView(TestCase):
         self.client.login(username="testuser1", password="testpassword1")
         self.post = Tweet.objects.create(user=self.user1, content="testpost1")
         self.like = Like.objects.create(tweet=self.post, user=self.user1)
+        Tweet.objects.filter(pk=self.post.pk).update(like_count=1)
         self.url = reverse("tweets:unlike", kwargs={"pk": self.post.pk})
 
     def test_success_post(self):
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 200)
         self.assertFalse(Like.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertEqual(response.json()["like_num"], 0)
 
     def test_failure_post_with_not_exist_tweet(self):
         url = reverse("tweets:unlike", kwargs={"pk": "100"})
@@ -191,3 +508,745 @@ class TestUnlikeView(TestCase):
         Like.objects.filter(tweet=self.post, user=self.user1).delete()
         response = self.client.post(self.url)
         self.assertEqual(response.status_code, 200)
+
+
+class TestLikeWritePath(TransactionTestCase):
+    def setUp(self):
+        self.users = User.objects.bulk_create(
+            [User(username=f"testuser{i}", email=f"test{i}@test.com") for i in range(16)]
+        )
+        self.post = Tweet.objects.create(user=self.users[0], content="testpost")
+
+    def assertStatements(self, number, write):
+        with CaptureQueriesContext(connection) as context:
+            write()
+        statements = [query["sql"] for query in context.captured_queries]
+        statements = [sql for sql in statements if not sql.startswith(("BEGIN", "COMMIT"))]
+        self.assertEqual(len(statements), number, statements)
+
+    def test_success_like_in_three_statements(self):
+        # The like, the like count and the trending bucket; a repeated like skips the bucket.
+        self.assertStatements(3, lambda: self.assertEqual(likes.like(self.post.pk, self.users[0]), 1))
+        self.assertStatements(2, lambda: self.assertEqual(likes.like(self.post.pk, self.users[0]), 1))
+        self.assertEqual(likes.unlike(self.post.pk, self.users[0]), 0)
+        self.assertEqual(likes.unlike(self.post.pk, self.users[0]), 0)
+        self.assertIsNone(likes.like(self.post.pk + 1, self.users[0]))
+        self.assertFalse(Like.objects.filter(tweet_id=self.post.pk + 1).exists())
+
+    def test_success_concurrent_likes(self):
+        def click(user):
+            try:
+                for _ in range(5):
+                    likes.like(self.post.pk, user)
+                    likes.unlike(self.post.pk, user)
+                likes.like(self.post.pk, user)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(click, self.users))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, len(self.users))
+        self.assertEqual(Like.objects.filter(tweet=self.post).count(), len(self.users))
+
+
+@override_settings(LIKE_WRITE_BEHIND=True)
+class TestLikeWriteBehind(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.client.login(username="testuser1", password="testpassword1")
+        self.post = Tweet.objects.create(user=self.user1, content="testpost")
+        self.like_url = reverse("tweets:like", kwargs={"pk": self.post.pk})
+        self.unlike_url = reverse("tweets:unlike", kwargs={"pk": self.post.pk})
+        self.state_url = reverse("tweets:like_state")
+
+    def test_success_post_like(self):
+        response = self.client.post(self.like_url)
+        self.assertEqual(response.json()["like_num"], 1)
+        self.assertFalse(Like.objects.exists())
+        response = self.client.get(self.state_url, {"ids": self.post.pk})
+        self.assertEqual(response.json()["tweets"], [{"tweet_pk": self.post.pk, "like_num": 1, "liked": True}])
+
+        self.client.login(username="testuser2", password="testpassword2")
+        response = self.client.get(self.state_url, {"ids": self.post.pk})
+        self.assertEqual(response.json()["tweets"], [{"tweet_pk": self.post.pk, "like_num": 1, "liked": False}])
+
+        self.assertEqual(like_buffer.flush(), 1)
+        self.assertTrue(Like.objects.filter(tweet=self.post, user=self.user1).exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.client.login(username="testuser1", password="testpassword1")
+        response = self.client.get(self.state_url, {"ids": self.post.pk})
+        self.assertEqual(response.json()["tweets"], [{"tweet_pk": self.post.pk, "like_num": 1, "liked": True}])
+
+    def test_success_post_coalesced(self):
+        self.client.post(self.like_url)
+        self.client.post(self.like_url)
+        self.client.post(self.unlike_url)
+        response = self.client.post(self.like_url)
+        self.assertEqual(response.json()["like_num"], 1)
+        self.client.login(username="testuser2", password="testpassword2")
+        self.client.post(self.like_url)
+        response = self.client.post(self.unlike_url)
+        self.assertEqual(response.json()["like_num"], 1)
+
+        with self.assertNumQueries(8):
+            self.assertEqual(like_buffer.flush(), 6)
+        self.assertEqual(list(Like.objects.values_list("user", flat=True)), [self.user1.pk])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(like_buffer.flush(), 0)
+
+    def test_success_post_unlike_existing_like(self):
+        Like.objects.create(tweet=self.post, user=self.user1)
+        Tweet.objects.filter(pk=self.post.pk).update(like_count=1)
+        response = self.client.post(self.unlike_url)
+        self.assertEqual(response.json()["like_num"], 0)
+        like_buffer.flush()
+        self.assertFalse(Like.objects.exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+    def test_failure_post_with_not_exist_tweet(self):
+        response = self.client.post(reverse("tweets:like", kwargs={"pk": "100"}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(like_buffer.flush(), 0)
+
+    def test_success_flush_skips_lost_intent(self):
+        self.client.post(self.like_url)
+        self.client.post(self.unlike_url)
+        cache.delete(like_buffer.intent_key(1))
+        self.assertEqual(like_buffer.flush(), 0)
+        self.assertEqual(like_buffer.flush(), 1)
+        self.assertFalse(Like.objects.exists())
+
+    @override_settings(LIKE_WRITE_BEHIND_TIMEOUT=0)
+    def test_success_flush_after_state_expired(self):
+        response = self.client.post(self.like_url)
+        self.assertEqual(response.json()["like_num"], 1)
+        self.assertEqual(like_buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(cache.get(like_buffer.pending_key(self.post.pk)), 0)
+        response = self.client.post(self.unlike_url)
+        self.assertEqual(response.json()["like_num"], 0)
+        self.assertEqual(like_buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        response = self.client.get(self.state_url, {"ids": self.post.pk})
+        self.assertEqual(response.json()["tweets"], [{"tweet_pk": self.post.pk, "like_num": 0, "liked": False}])
+
+    def test_success_flush_skipped_while_locked(self):
+        self.client.post(self.like_url)
+        cache.add(like_buffer.FLUSH_LOCK_KEY, True)
+        self.assertEqual(like_buffer.flush(), 0)
+        self.assertFalse(Like.objects.exists())
+        cache.delete(like_buffer.FLUSH_LOCK_KEY)
+        self.assertEqual(like_buffer.flush(), 1)
+        self.assertTrue(Like.objects.exists())
+
+    def test_success_flush_command(self):
+        self.client.post(self.like_url)
+        out = StringIO()
+        call_command("flush_likes", stdout=out)
+        self.assertIn("Applied 1 like intent(s).", out.getvalue())
+        self.assertTrue(Like.objects.exists())
+
+
+@override_settings(ASYNC_VIEWS=True)
+class TestAsyncLikeViews(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.async_client.force_login(self.user1)
+        self.post = Tweet.objects.create(user=self.user2, content="testpost")
+
+    def test_success_resolve(self):
+        self.assertIs(resolve(reverse("tweets:like", args=[self.post.pk])).func.view_class, views.AsyncLikeView)
+        self.assertIs(resolve(reverse("tweets:unlike", args=[self.post.pk])).func.view_class, views.AsyncUnlikeView)
+        self.assertIs(resolve(reverse("tweets:like_state")).func.view_class, views.AsyncLikeStateView)
+
+    async def test_success_post(self):
+        response = await self.async_client.post(reverse("tweets:like", kwargs={"pk": self.post.pk}))
+        self.assertEqual(response.json(), {"like_num": 1, "tweet_pk": self.post.pk, "liked": True})
+        self.assertTrue(await Like.objects.filter(tweet=self.post, user=self.user1).aexists())
+
+        response = await self.async_client.get(reverse("tweets:like_state"), {"ids": self.post.pk})
+        self.assertEqual(response.json()["tweets"], [{"tweet_pk": self.post.pk, "like_num": 1, "liked": True}])
+
+        response = await self.async_client.post(reverse("tweets:unlike", kwargs={"pk": self.post.pk}))
+        self.assertEqual(response.json(), {"like_num": 0, "tweet_pk": self.post.pk, "liked": False})
+        self.assertFalse(await Like.objects.aexists())
+
+    async def test_failure_post_with_not_exist_tweet(self):
+        response = await self.async_client.post(reverse("tweets:like", kwargs={"pk": 100}))
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.post(reverse("tweets:unlike", kwargs={"pk": 100}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_failure_get_with_invalid_ids(self):
+        response = await self.async_client.get(reverse("tweets:like_state"), {"ids": "1,a"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestTweetStream(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = reverse("tweets:stream")
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.stranger = User.objects.create_user(
+            username="stranger", email="stranger@test.com", password="testpassword"
+        )
+        FriendShip.objects.create(follower=self.user1, following=self.user2)
+        self.client.force_login(self.user1)
+        self.post1 = Tweet.objects.create(user=self.user2, content="testpost1")
+        timeline.fan_out(self.post1)
+        self.cursor = encode_cursor(self.post1.created_at, self.post1.pk)
+        self.post2 = Tweet.objects.create(user=self.user2, content="testpost2")
+        timeline.fan_out(self.post2)
+
+    def test_success_home_cursor(self):
+        response = self.client.get(reverse("tweets:home"))
+        self.assertEqual(response.context["stream_cursor"], encode_cursor(self.post2.created_at, self.post2.pk))
+        self.assertContains(response, f"{self.url}?cursor=")
+
+    def test_success_get(self):
+        response = self.client.get(self.url, {"cursor": self.cursor})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual(
+            b"".join(response.streaming_content).decode(),
+            f"retry: {settings.TWEET_STREAM_RETRY}\n\n"
+            + stream.format_event(self.post2, cards.render_cards([self.post2])[0]).decode(),
+        )
+
+    def test_success_get_with_last_event_id(self):
+        last_event_id = encode_cursor(self.post2.created_at, self.post2.pk)
+        response = self.client.get(self.url, {"cursor": self.cursor}, HTTP_LAST_EVENT_ID=last_event_id)
+        self.assertNotIn(b"event: tweet", b"".join(response.streaming_content))
+
+    def test_failure_get_with_invalid_cursor(self):
+        response = self.client.get(self.url, {"cursor": "invalid"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_success_publish_on_commit(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        queue = asyncio.Queue()
+        stream.broker.subscribe([self.user2.pk], loop, queue)
+        self.addCleanup(stream.broker.unsubscribe, [self.user2.pk], loop, queue)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post3 = Tweet.objects.create(user=self.user2, content="testpost3")
+            Tweet.objects.create(user=self.stranger, content="strangerpost")
+            post3.save()
+            loop.run_until_complete(asyncio.sleep(0))
+            self.assertTrue(queue.empty())
+        loop.run_until_complete(asyncio.sleep(0))
+        key, event = queue.get_nowait()
+        self.assertEqual(key, (post3.created_at, post3.pk))
+        self.assertIn(b"testpost3", event)
+        self.assertTrue(queue.empty())
+
+    def scope(self, cookie, **headers):
+        return {
+            "type": "http",
+            "method": "GET",
+            "path": self.url,
+            "query_string": f"cursor={self.cursor}".encode(),
+            "headers": [(b"cookie", cookie.encode())] + [(k.encode(), v.encode()) for k, v in headers.items()],
+        }
+
+    async def receive_event(self, communicator):
+        message = await communicator.receive_output()
+        self.assertTrue(message["more_body"])
+        return message["body"]
+
+    @override_settings(TWEET_STREAM_HEARTBEAT=0.05)
+    async def test_success_asgi_stream(self):
+        cookie = f"{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        application = stream.TweetStreamApplication(None)
+        communicator = ApplicationCommunicator(application, self.scope(cookie))
+        await communicator.send_input({"type": "http.request", "body": b""})
+        start = await communicator.receive_output()
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+        self.assertIn(b"testpost2", await self.receive_event(communicator))
+        self.assertEqual(await self.receive_event(communicator), b": heartbeat\n\n")
+
+        post3 = await Tweet.objects.acreate(user=self.user2, content="testpost3")
+        await sync_to_async(stream.broker.publish)(post3)
+        await sync_to_async(stream.broker.publish)(self.post2)
+        self.assertIn(b"testpost3", await self.receive_event(communicator))
+        self.assertEqual(await self.receive_event(communicator), b": heartbeat\n\n")
+
+        await communicator.send_input({"type": "http.disconnect"})
+        await communicator.wait()
+        self.assertEqual(stream.broker.subscribers, {})
+
+    async def test_failure_asgi_stream_without_login(self):
+        communicator = ApplicationCommunicator(stream.TweetStreamApplication(None), self.scope(""))
+        await communicator.send_input({"type": "http.request", "body": b""})
+        self.assertEqual((await communicator.receive_output())["status"], 403)
+
+
+class TestTweetCards(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        self.client.login(username="testuser", password="testpassword")
+        self.post1 = Tweet.objects.create(user=self.user, content="testpost1")
+        self.post2 = Tweet.objects.create(user=self.user, content="testpost2")
+
+    def test_success_render_cards(self):
+        card_list = cards.render_cards([self.post1, self.post2])
+        self.assertIn("testpost1", card_list[0])
+        self.assertIn("testpost2", card_list[1])
+        self.assertIsNotNone(cache.get(cards.card_key(self.post1)))
+        self.assertIsNotNone(cache.get(cards.card_key(self.post2)))
+
+    def test_success_render_cards_from_cache(self):
+        cards.render_cards([self.post1, self.post2])
+        with self.assertTemplateNotUsed("tweets/card.html"):
+            card_list = cards.render_cards([self.post1, self.post2])
+        self.assertIn("testpost1", card_list[0])
+
+    def test_success_render_cards_after_like(self):
+        cards.render_cards([self.post1])
+        self.client.post(reverse("tweets:like", kwargs={"pk": self.post1.pk}))
+        self.post1.refresh_from_db()
+        card_list = cards.render_cards([self.post1])
+        self.assertIn('<span class="like-num">1</span>', card_list[0])
+
+
+class TestTrending(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.client.login(username="testuser1", password="testpassword1")
+        self.post1 = Tweet.objects.create(user=self.user1, content="testpost1")
+        self.post2 = Tweet.objects.create(user=self.user2, content="testpost2")
+        self.post3 = Tweet.objects.create(user=self.user2, content="testpost3")
+        self.now = timezone.now()
+        self.minute = trending.minute_of(self.now)
+
+    def buckets(self):
+        return list(LikeBucket.objects.order_by("tweet", "minute").values_list("tweet", "count"))
+
+    def test_success_like_and_unlike(self):
+        self.client.post(reverse("tweets:like", kwargs={"pk": self.post1.pk}))
+        self.client.post(reverse("tweets:like", kwargs={"pk": self.post1.pk}))
+        self.assertEqual(self.buckets(), [(self.post1.pk, 1)])
+        self.client.post(reverse("tweets:unlike", kwargs={"pk": self.post1.pk}))
+        self.assertEqual(self.buckets(), [(self.post1.pk, 0)])
+
+    @override_settings(LIKE_WRITE_BEHIND=True)
+    def test_success_like_write_behind(self):
+        cache.clear()
+        self.client.post(reverse("tweets:like", kwargs={"pk": self.post1.pk}))
+        self.assertEqual(self.buckets(), [])
+        like_buffer.flush()
+        self.assertEqual(self.buckets(), [(self.post1.pk, 1)])
+
+    @override_settings(TRENDING_SIZE=2, TRENDING_WINDOW_MINUTES=60, TRENDING_HALF_LIFE_MINUTES=15)
+    def test_success_rollup(self):
+        LikeBucket.objects.bulk_create(
+            [
+                # Three likes 30 minutes ago weigh less than one now and one 15 minutes ago.
+                LikeBucket(tweet=self.post1, minute=self.minute - timedelta(minutes=30), count=3),
+                LikeBucket(tweet=self.post2, minute=self.minute, count=1),
+                LikeBucket(tweet=self.post2, minute=self.minute - timedelta(minutes=15), count=1),
+                LikeBucket(tweet=self.post3, minute=self.minute - timedelta(minutes=5), count=-1),
+                LikeBucket(tweet=self.post3, minute=self.minute - timedelta(minutes=60), count=10),
+            ]
+        )
+        self.assertEqual(trending.rollup(self.now), 2)
+        self.assertQuerysetEqual(
+            TrendingTweet.objects.order_by("rank").values_list("tweet", "score"),
+            [(self.post2.pk, 1.5), (self.post1.pk, 0.75)],
+        )
+        self.assertFalse(LikeBucket.objects.filter(minute__lte=self.minute - timedelta(minutes=60)).exists())
+
+        # The session, its user, and the K leaderboard rows with their tweets.
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("tweets:trending"))
+        self.assertEqual(len(response.context["card_list"]), 2)
+        self.assertLess(response.content.index(b"testpost2"), response.content.index(b"testpost1"))
+
+    def test_success_backfill(self):
+        Like.objects.create(tweet=self.post1, user=self.user1)
+        Like.objects.create(tweet=self.post1, user=self.user2)
+        Like.objects.create(tweet=self.post2, user=self.user1)
+        LikeBucket.objects.create(tweet=self.post3, minute=self.minute, count=5)
+        out = StringIO()
+        call_command("rollup_trending", "--backfill", stdout=out)
+        self.assertIn("Ranked 2 trending tweet(s).", out.getvalue())
+        self.assertEqual(sorted(self.buckets()), [(self.post1.pk, 2), (self.post2.pk, 1)])
+        self.assertQuerysetEqual(
+            TrendingTweet.objects.order_by("rank").values_list("tweet", flat=True), [self.post1.pk, self.post2.pk]
+        )
+
+    def test_success_benchmark(self):
+        Like.objects.create(tweet=self.post1, user=self.user1)
+        stdout = StringIO()
+        call_command("benchmark_trending", requests=2, stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertEqual((report["likes"], report["buckets"]), (1, 0))
+        for strategy in ["naive", "scores", "leaderboard"]:
+            self.assertEqual(set(report[strategy]), {"p50_ms", "p95_ms"})
+        self.assertFalse(TrendingTweet.objects.exists())
+
+    @override_settings(TRENDING_SIZE=2, TRENDING_WINDOW_MINUTES=60, TRENDING_HALF_LIFE_MINUTES=15)
+    def test_success_benchmark_naive_ranking(self):
+        for tweet, minutes_ago, users in [
+            (self.post1, 30, [self.user1, self.user2]),
+            (self.post2, 0, [self.user1]),
+            (self.post2, 15, [self.user2]),
+            (self.post3, 60, [self.user1, self.user2]),
+        ]:
+            for user in users:
+                like = Like.objects.create(tweet=tweet, user=user)
+                Like.objects.filter(pk=like.pk).update(created_at=self.now - timedelta(minutes=minutes_ago))
+        trending.backfill(self.now)
+        trending.rollup(self.now)
+        self.assertEqual(benchmark_trending.naive_trending(self.now), trending.leaderboard())
+        self.assertEqual(trending.leaderboard(), [self.post2, self.post1])
+
+
+class TestLikeStateView(TestCase):
+    def setUp(self):
+        self.url = reverse("tweets:like_state")
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.client.login(username="testuser1", password="testpassword1")
+        self.post1 = Tweet.objects.create(user=self.user1, content="testpost1", like_count=2)
+        self.post2 = Tweet.objects.create(user=self.user1, content="testpost2", like_count=1)
+        Like.objects.create(tweet=self.post1, user=self.user1)
+        Like.objects.create(tweet=self.post1, user=self.user2)
+        Like.objects.create(tweet=self.post2, user=self.user2)
+
+    def test_success_get(self):
+        response = self.client.get(self.url, {"ids": f"{self.post1.pk},{self.post2.pk},100"})
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(
+            response.json()["tweets"],
+            [
+                {"tweet_pk": self.post1.pk, "like_num": 2, "liked": True},
+                {"tweet_pk": self.post2.pk, "like_num": 1, "liked": False},
+            ],
+        )
+
+    def test_failure_get_with_invalid_ids(self):
+        response = self.client.get(self.url, {"ids": "1,a"})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(LIKE_STATE_MAX_IDS=1)
+    def test_failure_get_with_too_many_ids(self):
+        response = self.client.get(self.url, {"ids": f"{self.post1.pk},{self.post2.pk}"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestReconcileLikeCountsCommand(TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.post1 = Tweet.objects.create(user=self.user1, content="testpost1")
+        self.post2 = Tweet.objects.create(user=self.user1, content="testpost2", like_count=5)
+        Like.objects.create(tweet=self.post1, user=self.user1)
+        Like.objects.create(tweet=self.post1, user=self.user2)
+
+    def test_success_reconcile(self):
+        call_command("reconcile_like_counts", batch_size=1, stdout=StringIO())
+        self.post1.refresh_from_db()
+        self.post2.refresh_from_db()
+        self.assertEqual(self.post1.like_count, 2)
+        self.assertEqual(self.post2.like_count, 0)
+
+    def test_success_delete_user(self):
+        Tweet.objects.filter(pk=self.post1.pk).update(like_count=2)
+        self.user2.delete()
+        self.post1.refresh_from_db()
+        self.assertEqual(self.post1.like_count, 1)
+
+
+class TestSharedCacheCheck(TestCase):
+    def test_success_default(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(
+        TIMELINE_ETAGS=True,
+        LIKE_WRITE_BEHIND=True,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}},
+    )
+    def test_success_shared_cache(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(TIMELINE_ETAGS=True, LIKE_WRITE_BEHIND=True)
+    def test_failure_process_local_cache(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ["tweets.E001", "tweets.E002"])
+
+
+class TestQueryPlan(QueryPlanTestMixin, TestCase):
+    def setUp(self):
+        self.user1 = User.objects.create_user(username="testuser1", email="test1@test.com", password="testpassword1")
+        self.user2 = User.objects.create_user(username="testuser2", email="test2@test.com", password="testpassword2")
+        self.client.login(username="testuser1", password="testpassword1")
+        FriendShip.objects.create(follower=self.user2, following=self.user1)
+        self.post = Tweet.objects.create(user=self.user1, content="testpost")
+        timeline.fan_out(self.post)
+
+    @override_settings(TIMELINE_PAGE_SIZE=1)
+    def test_home(self):
+        timeline.fan_out(Tweet.objects.create(user=self.user1, content="testpost2"))
+        response = self.assertIndexedQueries("get", reverse("tweets:home"))
+        self.assertIndexedQueries("get", reverse("tweets:home"), {"cursor": response.context["next_cursor"]})
+
+    @override_settings(TIMELINE_PAGE_SIZE=1, TIMELINE_ETAGS=True)
+    def test_timeline(self):
+        timeline.fan_out(Tweet.objects.create(user=self.user1, content="testpost2"))
+        response = self.assertIndexedQueries("get", reverse("tweets:timeline"))
+        self.assertIndexedQueries("get", reverse("tweets:timeline"), {"cursor": response.json()["next_cursor"]})
+
+    def test_create(self):
+        self.assertIndexedQueries("post", reverse("tweets:create"), {"content": "testpost"})
+
+    def test_detail(self):
+        self.assertIndexedQueries("get", reverse("tweets:detail", kwargs={"pk": self.post.pk}))
+
+    def test_delete(self):
+        self.assertIndexedQueries("post", reverse("tweets:delete", kwargs={"pk": self.post.pk}))
+
+    def test_like_and_unlike(self):
+        self.assertIndexedQueries("post", reverse("tweets:like", kwargs={"pk": self.post.pk}))
+        self.assertIndexedQueries("post", reverse("tweets:unlike", kwargs={"pk": self.post.pk}))
+
+    def test_like_state(self):
+        self.assertIndexedQueries("get", reverse("tweets:like_state"), {"ids": self.post.pk})
+
+    def test_trending(self):
+        Like.objects.create(tweet=self.post, user=self.user2)
+        trending.backfill()
+        trending.rollup()
+        self.assertIndexedQueries("get", reverse("tweets:trending"))
+
+    def test_stream(self):
+        cursor = encode_cursor(self.post.created_at - timedelta(days=1), 0)
+        self.assertIndexedQueries("get", reverse("tweets:stream"), {"cursor": cursor})
+
+    @override_settings(SEARCH_PAGE_SIZE=1)
+    def test_search(self):
+        Tweet.objects.create(user=self.user1, content="testpost2")
+        response = self.assertIndexedQueries("get", reverse("tweets:search"), {"q": "testpost"})
+        self.assertIndexedQueries(
+            "get", reverse("tweets:search"), {"q": "testpost", "cursor": response.context["next_cursor"]}
+        )
+
+
+class TestQueryBudget(QueryBudgetTestMixin, TestCase):
+    def test_home(self):
+        self.assertConstantQueries("get", reverse("tweets:home"))
+
+    @override_settings(TIMELINE_ETAGS=True)
+    def test_timeline(self):
+        self.assertConstantQueries("get", reverse("tweets:timeline"))
+
+    def test_create_form(self):
+        self.assertConstantQueries("get", reverse("tweets:create"))
+
+    def test_create(self):
+        self.assertConstantQueries("post", reverse("tweets:create"), {"content": "testpost"})
+
+    def test_detail(self):
+        self.assertConstantQueries("get", lambda scale: reverse("tweets:detail", kwargs={"pk": self.make_tweet().pk}))
+
+    def test_delete_confirm(self):
+        self.assertConstantQueries("get", lambda scale: reverse("tweets:delete", kwargs={"pk": self.make_tweet().pk}))
+
+    def test_delete(self):
+        self.assertConstantQueries("post", lambda scale: reverse("tweets:delete", kwargs={"pk": self.make_tweet().pk}))
+
+    def test_like(self):
+        self.assertConstantQueries("post", lambda scale: reverse("tweets:like", kwargs={"pk": self.make_tweet().pk}))
+
+    def test_unlike(self):
+        self.assertConstantQueries(
+            "post", lambda scale: reverse("tweets:unlike", kwargs={"pk": self.make_tweet(liked=True).pk})
+        )
+
+    def test_like_state(self):
+        self.assertConstantQueries(
+            "get",
+            lambda scale: reverse("tweets:like_state")
+            + "?ids="
+            + ",".join(str(self.make_tweet(liked=True).pk) for _ in range(scale)),
+        )
+
+    def test_search(self):
+        self.assertConstantQueries("get", reverse("tweets:search"), {"q": "seedpost"})
+
+    def test_trending(self):
+        def rolled_up(scale):
+            trending.backfill()
+            trending.rollup()
+            return reverse("tweets:trending")
+
+        self.assertConstantQueries("get", rolled_up)
+
+    def test_stream(self):
+        cursor = encode_cursor(timezone.now() - timedelta(days=1), 0)
+        self.assertConstantQueries("get", reverse("tweets:stream"), {"cursor": cursor})
+
+
+class TestSeedDataCommand(TestCase):
+    def test_success_seed_and_benchmark(self):
+        call_command("seed_data", users=20, tweets=50, likes=100, random_seed=1, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Tweet.objects.count(), 50)
+        for tweet in Tweet.objects.all():
+            self.assertEqual(tweet.like_count, tweet.like_set.count())
+            self.assertEqual(Inbox.objects.filter(tweet=tweet).count(), tweet.user.followers_count + 1)
+        for user in User.objects.all():
+            self.assertEqual(user.followers_count, FriendShip.objects.filter(following=user).count())
+            self.assertEqual(user.followings_count, FriendShip.objects.filter(follower=user).count())
+
+        stdout = StringIO()
+        call_command("benchmark_views", requests=2, views=["tweets:home", "tweets:like"], stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        self.assertLessEqual({"GET tweets:home", "POST tweets:like", "POST tweets:unlike"}, set(report["views"]))
+        self.assertNotIn("GET tweets:detail", report["views"])
+        self.assertEqual(Like.objects.count(), sum(Tweet.objects.values_list("like_count", flat=True)))
+
+
+class TestImportJsonlCommand(TestCase):
+    def setUp(self):
+        self.existing = User.objects.create_user(username="existing", email="e@test.com", password="testpassword")
+        records = [
+            {"type": "user", "username": "alice", "email": "a@test.com", "password": make_password("alicepass")},
+            {"type": "user", "username": "bob", "date_joined": "2020-01-01T00:00:00Z"},
+            {
+                "type": "tweet",
+                "id": 100,
+                "username": "alice",
+                "content": "hello",
+                "created_at": "2020-01-02T00:00:00Z",
+            },
+            {"type": "tweet", "id": 101, "username": "existing", "content": "hi"},
+            {"type": "follow", "follower": "bob", "following": "alice"},
+            {"type": "follow", "follower": "existing", "following": "alice"},
+            {"type": "like", "username": "bob", "tweet_id": 100},
+            {"type": "like", "username": "existing", "tweet_id": 100},
+            {"type": "like", "username": "nobody", "tweet_id": 100},
+            {"type": "like", "username": "bob", "tweet_id": 999},
+            {"type": "follow", "follower": "bob", "following": "bob"},
+            {"type": "tweet", "id": 102, "username": "alice", "content": "x" * 141},
+            {"type": "retweet"},
+        ]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "import.jsonl")
+        with open(self.path, "w") as f:
+            f.writelines(json.dumps(record) + "\n" for record in records)
+            f.write("{not json\n\n")
+
+    def test_success_import(self):
+        stdout, stderr = StringIO(), StringIO()
+        call_command("import_jsonl", self.path, batch_size=2, transaction_size=3, stdout=stdout, stderr=stderr)
+        self.assertIn("Imported 2 user(s), 2 tweet(s), 2 follow(s), 2 like(s); skipped 4 invalid", stdout.getvalue())
+        self.assertIn("2 unresolved and 0 conflicting record(s).", stdout.getvalue())
+        self.assertIn("12 lines: 2 user(s)", stdout.getvalue())
+        self.assertIn("Line 11: a user cannot follow themselves.", stderr.getvalue())
+        self.assertIn("Line 14: not a user, tweet, follow or like object.", stderr.getvalue())
+
+        alice, bob = User.objects.get(username="alice"), User.objects.get(username="bob")
+        self.assertTrue(alice.check_password("alicepass"))
+        self.assertFalse(bob.has_usable_password())
+        self.assertEqual(bob.date_joined.isoformat(), "2020-01-01T00:00:00+00:00")
+        tweet = Tweet.objects.get(pk=100)
+        self.assertEqual((tweet.user, tweet.content, tweet.like_count), (alice, "hello", 2))
+        self.assertEqual(tweet.created_at.isoformat(), "2020-01-02T00:00:00+00:00")
+        self.assertEqual((alice.followers_count, bob.followings_count), (2, 1))
+        self.assertTrue(Inbox.objects.filter(owner=bob, tweet=tweet).exists())
+        self.assertNotEqual(Like.objects.get(user=bob).created_at, tweet.created_at)
+        self.assertTrue(Tweet._meta.get_field("created_at").auto_now_add)
+
+        stdout = StringIO()
+        call_command("import_jsonl", self.path, stdout=stdout, stderr=StringIO())
+        self.assertIn("Imported 0 user(s), 0 tweet(s), 0 follow(s), 0 like(s)", stdout.getvalue())
+        self.assertEqual((User.objects.count(), Tweet.objects.count(), Like.objects.count()), (3, 2, 2))
+        self.assertEqual(FriendShip.objects.count(), 2)
+
+    def test_success_import_with_taken_tweet_id(self):
+        taken = Tweet.objects.create(pk=100, user=self.existing, content="taken")
+        stdout = StringIO()
+        call_command("import_jsonl", self.path, stdout=stdout, stderr=StringIO())
+        self.assertIn("Imported 2 user(s), 1 tweet(s), 2 follow(s), 0 like(s)", stdout.getvalue())
+        self.assertIn("4 unresolved and 1 conflicting record(s).", stdout.getvalue())
+        taken.refresh_from_db()
+        self.assertEqual((taken.user, taken.content, taken.like_count), (self.existing, "taken", 0))
+        self.assertFalse(Like.objects.exists())
+
+    def test_failure_missing_file(self):
+        with self.assertRaisesMessage(CommandError, "Cannot read"):
+            call_command("import_jsonl", self.path + ".missing", stdout=StringIO())
+
+
+class TestBenchmarkAsgiCommand(TransactionTestCase):
+    def test_success_benchmark(self):
+        call_command("seed_data", users=50, tweets=50, likes=100, random_seed=1, stdout=StringIO())
+        like_count = Like.objects.count()
+        follow_count = FriendShip.objects.count()
+
+        stdout = StringIO()
+        call_command("benchmark_asgi", concurrency=2, requests=2, stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        for mode in ["sync", "async"]:
+            self.assertEqual(set(report[mode]), {"like", "follow"})
+            self.assertGreater(report[mode]["like"]["requests_per_sec"], 0)
+        self.assertEqual(Like.objects.count(), like_count)
+        self.assertEqual(FriendShip.objects.count(), follow_count)
+
+
+class TestSyncReplicaCommand(TransactionTestCase):
+    def test_success_copy(self):
+        User.objects.create_user(username="testuser", email="test@test.com", password="testpassword")
+        with tempfile.TemporaryDirectory() as directory:
+            replica = os.path.join(directory, "replica.sqlite3")
+            sync_replica.Command().copy(connection.settings_dict["NAME"], replica)
+            conn = sqlite3.connect(replica)
+            try:
+                rows = conn.execute(f"SELECT username FROM {User._meta.db_table}").fetchall()
+            finally:
+                conn.close()
+        self.assertEqual(rows, [("testuser",)])
+
+    def test_failure_copy_to_primary(self):
+        # Under test, the replica alias mirrors the primary.
+        with self.assertRaisesMessage(CommandError, "A replica is the primary database file itself."):
+            call_command("sync_replica", database=["replica"], stdout=StringIO())
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_failure_without_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command("sync_replica", stdout=StringIO())
+
+
+class TestBenchmarkDbCommand(TransactionTestCase):
+    def test_success_benchmark(self):
+        call_command("seed_data", users=20, tweets=20, likes=50, random_seed=1, stdout=StringIO())
+        like_count = Like.objects.count()
+
+        stdout = StringIO()
+        call_command("benchmark_db", threads=2, operations=20, write_ratio=0.5, stdout=stdout)
+        report = json.loads(stdout.getvalue())
+        for profile in ["before", "after"]:
+            self.assertEqual(report[profile]["errors"], 0)
+            self.assertGreater(report[profile]["reads_per_sec"], 0)
+            self.assertGreater(report[profile]["writes_per_sec"], 0)
+        self.assertEqual(report["after"]["connections_opened"], 2)
+        self.assertEqual(Like.objects.count(), like_count)
+        self.assertEqual(Like.objects.count(), sum(Tweet.objects.values_list("like_count", flat=True)))
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
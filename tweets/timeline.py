@@ -0,0 +1,99 @@
+import hashlib
+import time
+from itertools import chain, islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import FriendShip
+
+from . import likes
+from .models import Inbox, Tweet
+
+# New tweets show up as a newer first inbox entry. Everything else that changes a timeline
+# sets a version in the cache after commit: follows and unfollows the owner's, deleted tweets
+# the global one. Versions are clock values rather than counters, so one evicted from the
+# cache cannot come back with a value it had before.
+DELETED_VERSION_KEY = "timeline:deleted"
+
+
+def version_key(owner_pk):
+    return f"timeline:version:{owner_pk}"
+
+
+def touch(key):
+    transaction.on_commit(lambda: cache.set(key, time.time_ns(), None))
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def fan_out(tweet):
+    batch_size = settings.TIMELINE_FANOUT_BATCH_SIZE
+    follower_ids = (
+        FriendShip.objects.filter(following_id=tweet.user_id)
+        .values_list("follower_id", flat=True)
+        .iterator(chunk_size=batch_size)
+    )
+    for owner_ids in _batched(chain([tweet.user_id], follower_ids), batch_size):
+        Inbox.objects.bulk_create(
+            [Inbox(owner_id=owner_id, tweet_id=tweet.pk, created_at=tweet.created_at) for owner_id in owner_ids],
+            ignore_conflicts=True,
+        )
+
+
+def backfill(owner, author):
+    tweets = (
+        Tweet.objects.filter(user=author)
+        .order_by("-created_at", "-id")
+        .values_list("id", "created_at")[: settings.TIMELINE_INBOX_SIZE]
+    )
+    Inbox.objects.bulk_create(
+        [Inbox(owner=owner, tweet_id=tweet_id, created_at=created_at) for tweet_id, created_at in tweets],
+        batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    touch(version_key(owner.pk))
+
+
+def prune(owner, author):
+    Inbox.objects.filter(owner=owner, tweet__user=author).delete()
+    touch(version_key(owner.pk))
+
+
+def rebuild(owner):
+    followings = FriendShip.objects.filter(follower=owner).values("following_id")
+    tweets = (
+        Tweet.objects.filter(Q(user=owner) | Q(user__in=followings))
+        .order_by("-created_at", "-id")
+        .values_list("id", "created_at")[: settings.TIMELINE_INBOX_SIZE]
+    )
+    Inbox.objects.filter(owner=owner).delete()
+    Inbox.objects.bulk_create(
+        [Inbox(owner=owner, tweet_id=tweet_id, created_at=created_at) for tweet_id, created_at in tweets],
+        batch_size=settings.TIMELINE_FANOUT_BATCH_SIZE,
+    )
+    touch(version_key(owner.pk))
+
+
+def etag(owner, cursor):
+    """
+    Returns a value that changes whenever the owner's timeline page after ``cursor`` can,
+    including the owner's own likes, for one indexed query and one cache read. Other changes
+    are only seen through versions in the cache, so it has to be shared by every process.
+    """
+    newest = (
+        Inbox.objects.filter(owner=owner)
+        .order_by("-created_at", "-tweet_id")
+        .values_list("created_at", "tweet_id")
+        .first()
+    )
+    keys = [version_key(owner.pk), DELETED_VERSION_KEY, likes.version_key(owner.pk)]
+    versions = cache.get_many(keys)
+    value = repr((cursor, settings.TIMELINE_PAGE_SIZE, newest, [versions.get(key, 0) for key in keys]))
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
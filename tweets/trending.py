@@ -0,0 +1,100 @@
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from .models import Like, LikeBucket, TrendingTweet
+
+# Likes and unlikes add to a per-minute LikeBucket of the tweet, and rollup() turns the
+# buckets of the last TRENDING_WINDOW_MINUTES into the TRENDING_SIZE rows of TrendingTweet,
+# so that the trending page never aggregates the Like table.
+BUCKET_SQL = (
+    "INSERT INTO {bucket} ({tweet_id}, {minute}, {count}) VALUES (%s, %s, %s) "
+    "ON CONFLICT ({tweet_id}, {minute}) DO UPDATE SET {count} = {count} + excluded.{count}"
+)
+
+
+def minute_of(now):
+    return now.replace(second=0, microsecond=0)
+
+
+def record(counts, now=None):
+    """Adds {tweet_pk: net likes} to the buckets of the current minute."""
+    rows = [(tweet_pk, count) for tweet_pk, count in counts.items() if count]
+    if not rows:
+        return
+    minute = connection.ops.adapt_datetimefield_value(minute_of(now or timezone.now()))
+    quote = connection.ops.quote_name
+    sql = BUCKET_SQL.format(
+        bucket=quote(LikeBucket._meta.db_table),
+        **{column: quote(column) for column in ["tweet_id", "minute", "count"]},
+    )
+    params = [(tweet_pk, minute, count) for tweet_pk, count in rows]
+    with connection.cursor() as cursor:
+        if len(params) == 1:
+            cursor.execute(sql, params[0])
+        else:
+            cursor.executemany(sql, params)
+
+
+def backfill(now=None):
+    """Rebuilds the buckets of the window from the Like table, e.g. after import_jsonl, and returns their number."""
+    start = minute_of(now or timezone.now()) - timedelta(minutes=settings.TRENDING_WINDOW_MINUTES)
+    counts = (
+        Like.objects.filter(created_at__gte=start + timedelta(minutes=1))
+        .annotate(minute=TruncMinute("created_at"))
+        .values_list("tweet_id", "minute")
+        .annotate(count=Count("pk"))
+        .order_by()
+    )
+    with transaction.atomic():
+        LikeBucket.objects.filter(minute__gt=start).delete()
+        buckets = LikeBucket.objects.bulk_create(
+            [LikeBucket(tweet_id=tweet_pk, minute=minute, count=count) for tweet_pk, minute, count in counts],
+            batch_size=settings.TRENDING_ROLLUP_CHUNK_SIZE,
+        )
+    return len(buckets)
+
+
+def scores(now=None):
+    """
+    Returns {tweet_pk: score} for the buckets in the window, where a like counts 1 in the
+    current minute and half as much every TRENDING_HALF_LIFE_MINUTES before it.
+    """
+    minute = minute_of(now or timezone.now())
+    start = minute - timedelta(minutes=settings.TRENDING_WINDOW_MINUTES)
+    buckets = LikeBucket.objects.filter(minute__gt=start).values_list("tweet_id", "minute", "count")
+    totals = defaultdict(float)
+    for tweet_pk, bucket_minute, count in buckets.iterator(chunk_size=settings.TRENDING_ROLLUP_CHUNK_SIZE):
+        age = (minute - bucket_minute) / timedelta(minutes=1)
+        totals[tweet_pk] += count * 0.5 ** (age / settings.TRENDING_HALF_LIFE_MINUTES)
+    return totals
+
+
+def rollup(now=None):
+    """Replaces the leaderboard with the top TRENDING_SIZE scores, drops expired buckets and returns the size."""
+    now = now or timezone.now()
+    top = heapq.nlargest(
+        settings.TRENDING_SIZE, ((score, tweet_pk) for tweet_pk, score in scores(now).items() if score > 0)
+    )
+    start = minute_of(now) - timedelta(minutes=settings.TRENDING_WINDOW_MINUTES)
+    with transaction.atomic():
+        TrendingTweet.objects.all().delete()
+        TrendingTweet.objects.bulk_create(
+            [TrendingTweet(rank=rank, tweet_id=tweet_pk, score=score) for rank, (score, tweet_pk) in enumerate(top, 1)]
+        )
+        LikeBucket.objects.filter(minute__lte=start).delete()
+    return len(top)
+
+
+def leaderboard():
+    """The tweets of the leaderboard, read as a range of its rank primary key."""
+    rows = (
+        TrendingTweet.objects.filter(rank__lte=settings.TRENDING_SIZE).select_related("tweet__user").order_by("rank")
+    )
+    return [row.tweet for row in rows]
@@ -1,13 +1,32 @@
 from django.urls import path
 
+from mysite.views import SettingSwitchView
+
 from . import views
 
 app_name = "tweets"
 urlpatterns = [
     path("home/", views.HomeView.as_view(), name="home"),
+    path("timeline/", views.TimelineView.as_view(), name="timeline"),
+    path("search/", views.SearchView.as_view(), name="search"),
+    path("trending/", views.TrendingView.as_view(), name="trending"),
     path("create/", views.TweetCreateView.as_view(), name="create"),
     path("<int:pk>/", views.TweetDetailView.as_view(), name="detail"),
     path("<int:pk>/delete/", views.TweetDeleteView.as_view(), name="delete"),
-    path("<int:pk>/like/", views.LikeView.as_view(), name="like"),
-    path("<int:pk>/unlike/", views.UnlikeView.as_view(), name="unlike"),
+    path("stream/", views.TweetStreamView.as_view(), name="stream"),
+    path(
+        "<int:pk>/like/",
+        SettingSwitchView("ASYNC_VIEWS", views.LikeView.as_view(), views.AsyncLikeView.as_view()),
+        name="like",
+    ),
+    path(
+        "<int:pk>/unlike/",
+        SettingSwitchView("ASYNC_VIEWS", views.UnlikeView.as_view(), views.AsyncUnlikeView.as_view()),
+        name="unlike",
+    ),
+    path(
+        "like-state/",
+        SettingSwitchView("ASYNC_VIEWS", views.LikeStateView.as_view(), views.AsyncLikeStateView.as_view()),
+        name="like_state",
+    ),
 ]
@@ -1,30 +1,138 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Count, Prefetch
-from django.http import JsonResponse
-from django.shortcuts import get_object_or_404
-from django.urls import reverse_lazy
+from django.db.models import Exists, OuterRef
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.urls import reverse, reverse_lazy
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.views import View
-from django.views.generic import CreateView, DeleteView, DetailView, ListView
+from django.views.decorators.http import condition
+from django.views.generic import CreateView, DeleteView, DetailView, ListView, TemplateView
+
+from accounts import suggestions
+from accounts.mixins import AsyncLoginRequiredMixin
 
+from . import cards, like_buffer, likes, search, stream, timeline, trending
 from .forms import TweetCreateForm
-from .models import Like, Tweet
+from .models import Inbox, Like, Tweet
+from .pagination import KeysetPaginationMixin, encode_cursor
 
 
-class HomeView(LoginRequiredMixin, ListView):
-    template_name = "tweets/home.html"
-    model = Tweet
+class TimelineMixin(KeysetPaginationMixin):
     context_object_name = "tweet_list"
+    cursor_fields = ("created_at", "tweet_id")
+
+    def get_paginate_by(self, queryset):
+        return settings.TIMELINE_PAGE_SIZE
 
     def get_queryset(self):
-        queryset = (
-            Tweet.objects.select_related("user")
-            .annotate(like_num=Count("like"))
-            .prefetch_related(
-                Prefetch("like_set", queryset=Like.objects.filter(user=self.request.user), to_attr="liked")
+        return Inbox.objects.filter(owner=self.request.user).only("created_at", "tweet_id")
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, entries, is_paginated = super().paginate_queryset(queryset, page_size)
+        tweets = Tweet.objects.select_related("user").in_bulk([entry.tweet_id for entry in entries])
+        tweet_list = [tweets[entry.tweet_id] for entry in entries if entry.tweet_id in tweets]
+        return (paginator, page, tweet_list, is_paginated)
+
+
+class HomeView(LoginRequiredMixin, TimelineMixin, ListView):
+    template_name = "tweets/home.html"
+    read_from_replica = True
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["card_list"] = cards.render_cards(context["tweet_list"])
+        context["suggestion_list"] = suggestions.for_user(self.request.user)
+        if not self.request.GET.get(self.cursor_kwarg):
+            newest = context["tweet_list"][0] if context["tweet_list"] else None
+            context["stream_cursor"] = (
+                encode_cursor(newest.created_at, newest.pk) if newest else encode_cursor(timezone.now(), 0)
             )
-            .order_by("-created_at")
+        return context
+
+
+def timeline_etag(request, *args, **kwargs):
+    if not settings.TIMELINE_ETAGS:
+        return None
+    return timeline.etag(request.user, request.GET.get(TimelineMixin.cursor_kwarg, ""))
+
+
+@method_decorator(condition(etag_func=timeline_etag), name="get")
+class TimelineView(LoginRequiredMixin, TimelineMixin, ListView):
+    """
+    The home timeline as JSON. Like counts are left to tweets:like_state, so that the ETag
+    only has to follow the viewer's own likes, and with TIMELINE_ETAGS a client polling with
+    If-None-Match gets a 304 for one query on the inbox index.
+    """
+
+    def render_to_response(self, context, **response_kwargs):
+        tweet_list = context["tweet_list"]
+        liked = set(
+            Like.objects.filter(user=self.request.user, tweet__in=tweet_list).values_list("tweet_id", flat=True)
         )
-        return queryset
+        if settings.LIKE_WRITE_BEHIND:
+            states = like_buffer.apply_pending(
+                self.request.user, [(tweet.pk, 0, tweet.pk in liked) for tweet in tweet_list]
+            )
+            liked = {pk for pk, _, is_liked in states if is_liked}
+        context = {
+            "tweets": [
+                {
+                    "tweet_pk": tweet.pk,
+                    "username": tweet.user.username,
+                    "content": tweet.content,
+                    "created_at": tweet.created_at,
+                    "liked": tweet.pk in liked,
+                    "url": reverse("tweets:detail", args=[tweet.pk]),
+                }
+                for tweet in tweet_list
+            ],
+            "next_cursor": context["next_cursor"],
+        }
+        return JsonResponse(context, **response_kwargs)
+
+
+class SearchView(LoginRequiredMixin, TemplateView):
+    """
+    Full-text search ranked by relevance. Words shorter than search.TRIGRAM_LENGTH are not in
+    the index, so they are refused instead of scanning every tweet.
+    """
+
+    template_name = "tweets/search.html"
+    read_from_replica = True
+
+    def get(self, request, *args, **kwargs):
+        _, short = search.split_terms(request.GET.get("q", ""))
+        if short:
+            messages.warning(request, f"{search.TRIGRAM_LENGTH}文字以上の語で検索してください。")
+            return render(request, "error/400.html", status=400)
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get("q", "").strip()
+        tweet_list, next_cursor = search.search(query, self.request.GET.get("cursor"), settings.SEARCH_PAGE_SIZE)
+        context["query"] = query
+        context["card_list"] = cards.render_cards(tweet_list)
+        context["next_cursor"] = next_cursor
+        return context
+
+
+class TrendingView(LoginRequiredMixin, TemplateView):
+    """The leaderboard last written by rollup_trending."""
+
+    template_name = "tweets/trending.html"
+    read_from_replica = True
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["card_list"] = cards.render_cards(trending.leaderboard())
+        return context
 
 
 class TweetCreateView(LoginRequiredMixin, CreateView):
@@ -34,23 +142,29 @@ class TweetCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.user = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        timeline.fan_out(self.object)
+        return response
+
 
+def tweet_detail_etag(request, *args, **kwargs):
+    # Like counts move Tweet.updated_at, and the delete button depends on the viewer.
+    updated_at = Tweet.objects.filter(pk=kwargs["pk"]).values_list("updated_at", flat=True).first()
+    if updated_at is None:
+        return None
+    value = repr((updated_at, request.user.pk))
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
 
+
+@method_decorator(condition(etag_func=tweet_detail_etag), name="get")
 class TweetDetailView(LoginRequiredMixin, DetailView):
     template_name = "tweets/tweet_detail.html"
     model = Tweet
     context_object_name = "tweet"
+    read_from_replica = True
 
     def get_queryset(self):
-        queryset = (
-            Tweet.objects.select_related("user")
-            .annotate(like_num=Count("like"))
-            .prefetch_related(
-                Prefetch("like_set", queryset=Like.objects.filter(user=self.request.user), to_attr="liked")
-            )
-        )
-        return queryset
+        return Tweet.objects.select_related("user")
 
 
 class TweetDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
@@ -66,12 +180,13 @@ class TweetDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
 
 class LikeView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
-        tweet = get_object_or_404(Tweet, pk=kwargs["pk"])
-        Like.objects.get_or_create(tweet=tweet, user=request.user)
-        like_count = tweet.like_set.count()
+        write = like_buffer if settings.LIKE_WRITE_BEHIND else likes
+        like_count = write.like(kwargs["pk"], request.user)
+        if like_count is None:
+            raise Http404
         context = {
             "like_num": like_count,
-            "tweet_pk": tweet.pk,
+            "tweet_pk": kwargs["pk"],
             "liked": True,
         }
         return JsonResponse(context)
@@ -79,13 +194,104 @@ class LikeView(LoginRequiredMixin, View):
 
 class UnlikeView(LoginRequiredMixin, View):
     def post(self, request, *args, **kwargs):
-        user = request.user
-        tweet = get_object_or_404(Tweet, pk=kwargs["pk"])
-        Like.objects.filter(tweet=tweet, user=user).delete()
-        like_count = tweet.like_set.count()
+        write = like_buffer if settings.LIKE_WRITE_BEHIND else likes
+        like_count = write.unlike(kwargs["pk"], request.user)
+        if like_count is None:
+            raise Http404
+        context = {
+            "like_num": like_count,
+            "tweet_pk": kwargs["pk"],
+            "liked": False,
+        }
+        return JsonResponse(context)
+
+
+class AsyncLikeView(AsyncLoginRequiredMixin, View):
+    """
+    LikeView for ASGI. The write itself is not async: likes and like_buffer write in a
+    transaction, which the async ORM cannot open, so they run in a thread by sync_to_async.
+    """
+
+    async def post(self, request, *args, **kwargs):
+        write = like_buffer if settings.LIKE_WRITE_BEHIND else likes
+        like_count = await sync_to_async(write.like)(kwargs["pk"], request.user)
+        if like_count is None:
+            raise Http404
+        context = {
+            "like_num": like_count,
+            "tweet_pk": kwargs["pk"],
+            "liked": True,
+        }
+        return JsonResponse(context)
+
+
+class AsyncUnlikeView(AsyncLoginRequiredMixin, View):
+    """UnlikeView for ASGI. As in AsyncLikeView, the write runs in a thread by sync_to_async."""
+
+    async def post(self, request, *args, **kwargs):
+        write = like_buffer if settings.LIKE_WRITE_BEHIND else likes
+        like_count = await sync_to_async(write.unlike)(kwargs["pk"], request.user)
+        if like_count is None:
+            raise Http404
         context = {
             "like_num": like_count,
-            "tweet_pk": tweet.pk,
+            "tweet_pk": kwargs["pk"],
             "liked": False,
         }
         return JsonResponse(context)
+
+
+class LikeStateView(LoginRequiredMixin, View):
+    def get(self, request, *args, **kwargs):
+        ids = request.GET.get("ids", "").split(",")
+        if not all(pk.isdigit() for pk in ids) or len(ids) > settings.LIKE_STATE_MAX_IDS:
+            return JsonResponse({"error": "無効なリクエストです。"}, status=400)
+
+        tweets = (
+            Tweet.objects.filter(pk__in=ids)
+            .annotate(liked=Exists(Like.objects.filter(tweet=OuterRef("pk"), user=request.user)))
+            .values_list("pk", "like_count", "liked")
+        )
+        if settings.LIKE_WRITE_BEHIND:
+            tweets = like_buffer.apply_pending(request.user, tweets)
+        context = {
+            "tweets": [{"tweet_pk": pk, "like_num": like_count, "liked": liked} for pk, like_count, liked in tweets],
+        }
+        return JsonResponse(context)
+
+
+class AsyncLikeStateView(AsyncLoginRequiredMixin, View):
+    async def get(self, request, *args, **kwargs):
+        ids = request.GET.get("ids", "").split(",")
+        if not all(pk.isdigit() for pk in ids) or len(ids) > settings.LIKE_STATE_MAX_IDS:
+            return JsonResponse({"error": "無効なリクエストです。"}, status=400)
+
+        tweets = [
+            row
+            async for row in Tweet.objects.filter(pk__in=ids)
+            .annotate(liked=Exists(Like.objects.filter(tweet=OuterRef("pk"), user=request.user)))
+            .values_list("pk", "like_count", "liked")
+        ]
+        if settings.LIKE_WRITE_BEHIND:
+            tweets = await sync_to_async(like_buffer.apply_pending)(request.user, tweets)
+        context = {
+            "tweets": [{"tweet_pk": pk, "like_num": like_count, "liked": liked} for pk, like_count, liked in tweets],
+        }
+        return JsonResponse(context)
+
+
+class TweetStreamView(LoginRequiredMixin, View):
+    """
+    Server-sent events of the tweets in the home timeline after the cursor, for WSGI. It sends
+    what is already there and closes, and the browser reconnects after TWEET_STREAM_RETRY
+    milliseconds with the last event id. Under ASGI, TweetStreamApplication keeps it open.
+    """
+
+    def get(self, request, *args, **kwargs):
+        cursor = request.headers.get("Last-Event-ID") or request.GET.get("cursor", "")
+        events = [event for _, event in stream.catch_up(request.user, cursor)]
+        response = StreamingHttpResponse(
+            [f"retry: {settings.TWEET_STREAM_RETRY}\n\n".encode(), *events], content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        return response